@@ -1,9 +1,23 @@
+import logging
+import os
 import streamlit as st
 import pandas as pd
 import numpy as np
 import joblib
 import plotly.express as px
+import plotly.graph_objects as go
 from sklearn.pipeline import Pipeline
+from compact_model import CompactPipeline, compact_pipeline, load_compact
+from features import MODEL_FEATURES, build_first_innings_input, build_model_input, match_schedule, overs_to_balls
+from app_inputs import calculate_advanced_metrics, create_input_dataframe
+from venues import VENUES
+from explain import ForestExplainer
+from instrumentation import LatencyRecorder, PayloadMeter, serve_metrics, profile_call
+from match_curves import load_curves
+from drift import DriftMonitor, load_profile
+from scenario_planner import ScenarioPlanner, load_rates, outcome_probs
+
+logger = logging.getLogger(__name__)
 
 # Set page configuration
 st.set_page_config(
@@ -13,8 +27,8 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# Custom CSS for enhanced styling
-st.markdown("""
+# Custom CSS for enhanced styling, emitted on full reruns only
+APP_CSS = """
 <style>
 :root {
     --primary: #4CAF50;
@@ -341,9 +355,9 @@ st.markdown("""
     align-items: center !important;
 }
 </style>
-""", unsafe_allow_html=True)
+"""
 
-# Teams and venues data (must match the training data exactly)
+# Teams and venues data (must match the training data exactly; VENUES comes from venues.py)
 TEAMS = [
     'Chennai Super Kings', 'Delhi Capitals', 'Kolkata Knight Riders',
     'Mumbai Indians', 'Punjab Kings', 'Rajasthan Royals',
@@ -351,16 +365,6 @@ TEAMS = [
     'Gujarat Titans', 'Lucknow Super Giants'
 ]
 
-VENUES = [
-    'Eden Gardens', 'Wankhede Stadium', 'MA Chidambaram Stadium',
-    'Arun Jaitley Stadium', 'Narendra Modi Stadium',
-    'M. Chinnaswamy Stadium', 'Punjab Cricket Association Stadium',
-    'Rajiv Gandhi International Stadium', 'Sawai Mansingh Stadium',
-    'Bharat Ratna Shri Atal Bihari Vajpayee Ekana Cricket Stadium',
-    'Brabourne Stadium', 'DY Patil Stadium', 'Holkar Cricket Stadium',
-    'Others'
-]
-
 # Team colors for visualizations
 TEAM_COLORS = {
     'Chennai Super Kings': '#FDB913',
@@ -376,10 +380,149 @@ TEAM_COLORS = {
 }
 
 
+# Compacted model written by the training script (or compact_model.py), preferred when current
+COMPACT_MODEL_DIR = 'advanced_pipe_compact'
+
+
+# Projected-total model for the first innings, written by the training script
+FIRST_INNINGS_MODEL_PATH = 'first_innings_model.pkl'
+
+# Head-to-head/venue/toss prior written by the training script, blended into chase predictions
+PREMATCH_MODEL_PATH = 'prematch_model.pkl'
+
+# Training feature distribution written by the training script, for drift monitoring
+TRAINING_PROFILE_PATH = 'training_profile.json'
+
+
+# Precomputed historical win probability curves, written by match_curves.py
+MATCH_CURVES_DIR = 'match_curves'
+
+# Per-ball chase outcome rates by venue and team, written by scenario_planner.py
+OUTCOME_RATES_PATH = 'outcome_rates.json'
+
+
 # Load model with caching
 @st.cache_resource
 def load_model():
-    return joblib.load('advanced_pipe.pkl')
+    """The one in-memory copy of the model: the compact directory when it is current,
+    otherwise the pickle, with a forest pipeline compacted so its sklearn forest is freed"""
+    if compact_model_is_current():
+        return load_compact(COMPACT_MODEL_DIR)
+    model = joblib.load('advanced_pipe.pkl')
+    try:
+        return compact_pipeline(model)
+    except TypeError:
+        # Boosting and phase-routed models are served as trained
+        return model
+
+
+def compact_model_is_current():
+    """Whether the compact directory exists and was written no earlier than advanced_pipe.pkl"""
+    meta = os.path.join(COMPACT_MODEL_DIR, 'meta.json')
+    if not os.path.exists(meta):
+        return False
+    # A compact copy older than the pickle is left over from a previous model
+    return not os.path.exists('advanced_pipe.pkl') or os.path.getmtime(meta) >= os.path.getmtime('advanced_pipe.pkl')
+
+
+@st.cache_resource
+def load_first_innings_model():
+    if not os.path.exists(FIRST_INNINGS_MODEL_PATH):
+        return None
+    return joblib.load(FIRST_INNINGS_MODEL_PATH)
+
+
+@st.cache_resource
+def load_prematch_model():
+    if not os.path.exists(PREMATCH_MODEL_PATH):
+        return None
+    return joblib.load(PREMATCH_MODEL_PATH)
+
+
+@st.cache_resource
+def load_explainer():
+    """Contribution explainer for forest models, None for other model types"""
+    model = load_model()
+    return ForestExplainer(model) if isinstance(model, CompactPipeline) else None
+
+
+@st.cache_data(max_entries=1024)
+def explain_state(state_key):
+    """Per-feature contributions for one model input row, cached per state"""
+    input_df = pd.DataFrame([dict(zip(MODEL_FEATURES, state_key))])
+    return load_explainer().explain(input_df).iloc[0].to_dict()
+
+
+@st.cache_resource
+def load_match_curves():
+    """Memory-mapped historical curves, None until match_curves.py has been run"""
+    if not os.path.isdir(MATCH_CURVES_DIR):
+        return None
+    return load_curves(MATCH_CURVES_DIR)
+
+
+@st.cache_resource
+def load_outcome_rates():
+    """Venue and team outcome rates, None until scenario_planner.py has been run"""
+    if not os.path.exists(OUTCOME_RATES_PATH):
+        return None
+    return load_rates(OUTCOME_RATES_PATH)
+
+
+@st.cache_resource(max_entries=64)
+def load_planner(venue, batting_team, total_balls):
+    """Scenario planner value table for one venue, chasing team and chase length, solved once"""
+    return ScenarioPlanner(outcome_probs(load_outcome_rates(), venue, batting_team), total_balls=total_balls)
+
+
+@st.cache_data
+def load_historical_matches():
+    """matches.csv with the chasing team of every match, newest first"""
+    matches = pd.read_csv('matches.csv')
+    schedule = match_schedule(matches)
+    matches['batting_first'] = schedule['bat_first'].to_numpy()
+    matches['chasing'] = schedule['chasing'].to_numpy()
+    return matches.sort_values('date', ascending=False).set_index('id')
+
+
+@st.cache_resource
+def get_recorder():
+    """Process-wide latency recorder, served as JSON when IPL_METRICS_PORT is set"""
+    recorder = LatencyRecorder()
+    port = os.environ.get('IPL_METRICS_PORT')
+    if port:
+        serve_metrics(recorder, int(port))
+    return recorder
+
+
+@st.cache_resource
+def get_drift_monitor():
+    """Process-wide monitor of live model inputs, None without a training profile"""
+    if not os.path.exists(TRAINING_PROFILE_PATH):
+        return None
+    return DriftMonitor(load_profile(TRAINING_PROFILE_PATH))
+
+
+@st.cache_resource
+def get_payload_meter():
+    """Process-wide meter of the markup and figure bytes each run sends"""
+    return PayloadMeter()
+
+
+# Widgets inside a fragment rerun only that fragment (st.fragment needs Streamlit >= 1.37)
+fragment = getattr(st, 'fragment', None) or getattr(st, 'experimental_fragment', lambda func: func)
+
+
+def render_html(markup):
+    """Emit raw HTML, counting it towards this run's payload"""
+    get_payload_meter().add(len(markup.encode()))
+    st.markdown(markup, unsafe_allow_html=True)
+
+
+def render_figure(figure, nbytes):
+    """Emit a plotly figure whose serialized size is already known"""
+    get_payload_meter().add(nbytes)
+    st.plotly_chart(figure, use_container_width=True)
 
 
 def sidebar_content():
@@ -442,62 +585,6 @@ def sidebar_content():
         """, unsafe_allow_html=True)
 
 
-def calculate_advanced_metrics(params):
-    """Calculate all advanced metrics exactly as in the training code"""
-    balls_left = max(120 - (params['overs_completed'] * 6), 0)
-    runs_left = max(params['target'] - params['current_score'], 0)
-    crr = params['current_score'] / params['overs_completed'] if params['overs_completed'] > 0 else 0
-    rrr = (runs_left * 6) / balls_left if balls_left > 0 else 0
-
-    # Calculate dot ball percentage (simplified for prediction interface)
-    dot_ball_percent = min(0.6, params['wickets'] * 0.1)
-
-    # Calculate wickets in hand first
-    wickets_in_hand = 10 - params['wickets']
-
-    # Calculate momentum shift (more sophisticated version)
-    momentum_shift = (params['current_score'] - (crr * params['overs_completed'])) * (1 + (wickets_in_hand / 10))
-
-    metrics = {
-        'balls_left': balls_left,
-        'runs_left': runs_left,
-        'crr': crr,
-        'rrr': rrr,
-        'wickets_in_hand': wickets_in_hand,
-        'pressure_index': rrr / crr if crr > 0 else 0,
-        'momentum_shift_index': momentum_shift,
-        'dot_ball_percent': dot_ball_percent,
-        'top_batsman_playing': params.get('top_batsman_playing', 0),
-        'recent_partnership': params.get('recent_partnership', 30),
-        'wickets': params['wickets'],
-        'current_score': params['current_score'],
-        'target': params['target'],
-        'overs_completed': params['overs_completed']
-    }
-
-    return metrics
-
-
-def create_input_dataframe(batting_team, bowling_team, venue, metrics):
-    """Create the input dataframe matching the training data structure exactly"""
-    return pd.DataFrame({
-        'batting_team': [batting_team],
-        'bowling_team': [bowling_team],
-        'venue': [venue],
-        'current_score': [metrics['current_score']],
-        'wickets': [metrics['wickets']],
-        'balls_left': [metrics['balls_left']],
-        'runs_left': [metrics['runs_left']],
-        'crr': [metrics['crr']],
-        'rrr': [metrics['rrr']],
-        'pressure_index': [metrics['pressure_index']],
-        'momentum_shift_index': [metrics['momentum_shift_index']],
-        'dot_ball_percent': [metrics['dot_ball_percent']],
-        'wickets_in_hand': [metrics['wickets_in_hand']],
-        'top_batsman_playing': [metrics['top_batsman_playing']]
-    })
-
-
 # Add this dictionary with team stats near the TEAMS and VENUES definitions
 TEAM_STATS = {
     'Chennai Super Kings': {
@@ -643,11 +730,26 @@ TEAM_STATS = {
 }
 
 
-# Then modify the display_team_comparison function to use these stats:
-def display_team_comparison(batting_team, bowling_team):
-    """Display team comparison cards with visual indicators"""
-    st.markdown("### 🏆 Team Comparison")
+def _team_card_html(team, stats, default_color):
+    color = TEAM_COLORS.get(team, default_color)
+    rows = ''.join(f'<div class="stat-item"><span class="stat-label">{k}</span>'
+                   f'<span class="stat-value">{v}</span></div>' for k, v in stats.items())
+    return f"""
+        <div class="team-card" style="border-top: 4px solid {color}">
+            <div class="team-logo" style="background: {color}; color: white;">
+                {team[0]}
+            </div>
+            <h3 style="margin: 0.5rem 0; color: {color}">{team}</h3>
+            <div class="team-stats">
+                {rows}
+            </div>
+        </div>
+        """
 
+
+@st.cache_data(max_entries=256)
+def team_comparison_html(batting_team, bowling_team):
+    """Batting and bowling team cards, built once per team pair"""
     # Get stats from the TEAM_STATS dictionary
     batting_stats = TEAM_STATS.get(batting_team, {}).get('batting', {
         'Win Rate': '58%',
@@ -662,141 +764,135 @@ def display_team_comparison(batting_team, bowling_team):
         'Powerplay Eco': '7.4',
         'Death Overs Eco': '9.8'
     })
+    return _team_card_html(batting_team, batting_stats, '#4CAF50'), _team_card_html(bowling_team, bowling_stats, '#F44336')
+
 
+def display_team_comparison(batting_team, bowling_team):
+    """Display team comparison cards with visual indicators"""
+    st.markdown("### 🏆 Team Comparison")
+
+    batting_html, bowling_html = team_comparison_html(batting_team, bowling_team)
     col1, col2 = st.columns(2)
 
     with col1:
-        st.markdown(f"""
-        <div class="team-card" style="border-top: 4px solid {TEAM_COLORS.get(batting_team, '#4CAF50')}">
-            <div class="team-logo" style="background: {TEAM_COLORS.get(batting_team, '#4CAF50')}; color: white;">
-                {batting_team[0]}
-            </div>
-            <h3 style="margin: 0.5rem 0; color: {TEAM_COLORS.get(batting_team, '#4CAF50')}">{batting_team}</h3>
-            <div class="team-stats">
-                {''.join([f'<div class="stat-item"><span class="stat-label">{k}</span><span class="stat-value">{v}</span></div>' for k, v in batting_stats.items()])}
-            </div>
-        </div>
-        """, unsafe_allow_html=True)
+        render_html(batting_html)
 
     with col2:
-        st.markdown(f"""
-        <div class="team-card" style="border-top: 4px solid {TEAM_COLORS.get(bowling_team, '#F44336')}">
-            <div class="team-logo" style="background: {TEAM_COLORS.get(bowling_team, '#F44336')}; color: white;">
-                {bowling_team[0]}
-            </div>
-            <h3 style="margin: 0.5rem 0; color: {TEAM_COLORS.get(bowling_team, '#F44336')}">{bowling_team}</h3>
-            <div class="team-stats">
-                {''.join([f'<div class="stat-item"><span class="stat-label">{k}</span><span class="stat-value">{v}</span></div>' for k, v in bowling_stats.items()])}
-            </div>
-        </div>
-        """, unsafe_allow_html=True)
-
-
-def display_impact_factors(metrics):
-    """Display visual impact factors"""
-    st.markdown("### 📊 Match Impact Factors")
-
-    col1, col2, col3 = st.columns(3)
-
-    with col1:
-        st.markdown(f"""
+        render_html(bowling_html)
+
+
+@st.cache_data(max_entries=1024)
+def impact_factors_html(rrr, momentum_shift_index, pressure_index, dot_ball_percent, wickets_in_hand,
+                        top_batsman_playing):
+    """The six impact factor cards for one metrics tuple, in display order"""
+    cards = [
+        ('🏃‍♂️', 'Required Run Rate', TEAM_COLORS.get('Royal Challengers Bangalore', '#F44336'), f"{rrr:.2f}"),
+        ('⚡', 'Momentum Shift', TEAM_COLORS.get('Kolkata Knight Riders', '#3A225D'), f"{momentum_shift_index:.1f}"),
+        ('🎯', 'Pressure Index', TEAM_COLORS.get('Mumbai Indians', '#005DA0'), f"{pressure_index:.2f}"),
+        ('🚫', 'Dot Ball %', TEAM_COLORS.get('Chennai Super Kings', '#FDB913'), f"{dot_ball_percent * 100:.1f}%"),
+        ('🏏', 'Wickets in Hand', TEAM_COLORS.get('Sunrisers Hyderabad', '#FB643E'), f"{wickets_in_hand}/10"),
+        ('👑', 'Top Batsman', TEAM_COLORS.get('Rajasthan Royals', '#2D4D9D'), 'Yes' if top_batsman_playing else 'No'),
+    ]
+    return [f"""
         <div class="impact-factor">
-            <div class="impact-icon">🏃‍♂️</div>
+            <div class="impact-icon">{icon}</div>
             <div>
-                <div class="impact-label">Required Run Rate</div>
-                <div class="impact-value" style="color: {TEAM_COLORS.get('Royal Challengers Bangalore', '#F44336')}">
-                    {metrics['rrr']:.2f}
+                <div class="impact-label">{label}</div>
+                <div class="impact-value" style="color: {color}">
+                    {value}
                 </div>
             </div>
         </div>
-        """, unsafe_allow_html=True)
+        """ for icon, label, color, value in cards]
 
-        st.markdown(f"""
-        <div class="impact-factor">
-            <div class="impact-icon">⚡</div>
-            <div>
-                <div class="impact-label">Momentum Shift</div>
-                <div class="impact-value" style="color: {TEAM_COLORS.get('Kolkata Knight Riders', '#3A225D')}">
-                    {metrics['momentum_shift_index']:.1f}
-                </div>
-            </div>
-        </div>
-        """, unsafe_allow_html=True)
 
-    with col2:
-        st.markdown(f"""
-        <div class="impact-factor">
-            <div class="impact-icon">🎯</div>
-            <div>
-                <div class="impact-label">Pressure Index</div>
-                <div class="impact-value" style="color: {TEAM_COLORS.get('Mumbai Indians', '#005DA0')}">
-                    {metrics['pressure_index']:.2f}
-                </div>
-            </div>
-        </div>
-        """, unsafe_allow_html=True)
+def display_impact_factors(metrics):
+    """Display visual impact factors"""
+    st.markdown("### 📊 Match Impact Factors")
 
-        st.markdown(f"""
-        <div class="impact-factor">
-            <div class="impact-icon">🚫</div>
-            <div>
-                <div class="impact-label">Dot Ball %</div>
-                <div class="impact-value" style="color: {TEAM_COLORS.get('Chennai Super Kings', '#FDB913')}">
-                    {metrics['dot_ball_percent'] * 100:.1f}%
-                </div>
-            </div>
-        </div>
-        """, unsafe_allow_html=True)
+    cards = impact_factors_html(metrics['rrr'], metrics['momentum_shift_index'], metrics['pressure_index'],
+                                metrics['dot_ball_percent'], metrics['wickets_in_hand'],
+                                metrics['top_batsman_playing'])
+    for column, pair in zip(st.columns(3), [cards[0:2], cards[2:4], cards[4:6]]):
+        with column:
+            for card in pair:
+                render_html(card)
+
+
+# Display names and icons for model features in the contribution cards
+FEATURE_LABELS = {
+    'batting_team': ('Batting Team', '🏏'),
+    'bowling_team': ('Bowling Team', '🎯'),
+    'venue': ('Venue', '🏟️'),
+    'current_score': ('Current Score', '📊'),
+    'wickets': ('Wickets Fallen', '⚠️'),
+    'balls_left': ('Balls Left', '⏱️'),
+    'runs_left': ('Runs Needed', '🏃‍♂️'),
+    'crr': ('Current Run Rate', '📈'),
+    'rrr': ('Required Run Rate', '🏃‍♂️'),
+    'pressure_index': ('Pressure Index', '🎯'),
+    'momentum_shift_index': ('Momentum Shift', '⚡'),
+    'dot_ball_percent': ('Dot Ball %', '🚫'),
+    'wickets_in_hand': ('Wickets in Hand', '🏏'),
+    'top_batsman_playing': ('Top Batsman', '👑'),
+    'prematch': ('Pre-match Prior', '🪙'),
+}
 
-    with col3:
-        st.markdown(f"""
-        <div class="impact-factor">
-            <div class="impact-icon">🏏</div>
-            <div>
-                <div class="impact-label">Wickets in Hand</div>
-                <div class="impact-value" style="color: {TEAM_COLORS.get('Sunrisers Hyderabad', '#FB643E')}">
-                    {metrics['wickets_in_hand']}/10
-                </div>
-            </div>
-        </div>
-        """, unsafe_allow_html=True)
 
-        st.markdown(f"""
-        <div class="impact-factor">
-            <div class="impact-icon">👑</div>
-            <div>
-                <div class="impact-label">Top Batsman</div>
-                <div class="impact-value" style="color: {TEAM_COLORS.get('Rajasthan Royals', '#2D4D9D')}">
-                    {'Yes' if metrics['top_batsman_playing'] else 'No'}
+def display_model_contributions(contributions, input_row, top_n=6):
+    """Display the features that moved this prediction most, as used by the model"""
+    st.markdown("### 📊 What Drove This Prediction")
+
+    features = sorted((f for f in FEATURE_LABELS if f in contributions),
+                      key=lambda f: abs(contributions[f]), reverse=True)[:top_n]
+    columns = st.columns(3)
+    for i, feature in enumerate(features):
+        label, icon = FEATURE_LABELS[feature]
+        value = input_row[feature]
+        shown = f"{value:.2f}" if isinstance(value, float) else value
+        impact = contributions[feature] * 100
+        color = '#2E7D32' if impact >= 0 else '#C62828'
+        with columns[i % 3]:
+            st.markdown(f"""
+            <div class="impact-factor">
+                <div class="impact-icon">{icon}</div>
+                <div>
+                    <div class="impact-label">{label}: {shown}</div>
+                    <div class="impact-value" style="color: {color}">{impact:+.1f} pts</div>
                 </div>
             </div>
-        </div>
-        """, unsafe_allow_html=True)
+            """, unsafe_allow_html=True)
 
+    st.caption(f"Baseline win probability {contributions['bias'] * 100:.1f}%; "
+               "points show how far each factor moved the batting team's chance from it")
 
-def display_prediction_timeline(metrics, win_prob):
-    """Display a visual timeline of the match progression"""
-    st.markdown("### ⏳ Match Progression Timeline")
 
-    # Create timeline data
+@st.cache_data(max_entries=256)
+def prediction_timeline_figure(batting_team, venue, current_score, crr, target, wickets_in_hand, balls_now,
+                               total_balls):
+    """Projection figure and its serialized size, built once per metrics tuple"""
+    balls = np.append(np.arange(0, total_balls, 6), total_balls)
+    overs = balls / 6
+    # Score that keeps a 50% chance at each over, with the wickets in hand now
+    par = load_planner(venue, batting_team, total_balls).par_score(target, total_balls - balls, wickets_in_hand)
     timeline = pd.DataFrame({
-        'Overs': np.arange(0, 20.1, 1),
-        'Projected Score': [metrics['current_score'] + (metrics['crr'] * (o - metrics['overs_completed'])) for o in
-                            np.arange(0, 20.1, 1)],
-        'Required Rate': [metrics['rrr'] * (1 - (o / 20)) for o in np.arange(0, 20.1, 1)]
+        'Overs': overs,
+        'Projected Score': current_score + crr * (overs - balls_now / 6),
+        'Par Score': par
     })
 
-    fig = px.line(timeline, x='Overs', y=['Projected Score', 'Required Rate'],
+    fig = px.line(timeline, x='Overs', y=['Projected Score', 'Par Score'],
                   title="Match Progression Projection",
                   labels={'value': 'Runs', 'variable': 'Metric'},
                   color_discrete_map={
                       'Projected Score': TEAM_COLORS.get('Royal Challengers Bangalore', '#EC1C24'),
-                      'Required Rate': TEAM_COLORS.get('Kolkata Knight Riders', '#3A225D')
+                      'Par Score': TEAM_COLORS.get('Kolkata Knight Riders', '#3A225D')
                   })
+    fig.add_hline(y=target, line_dash="dot", line_color="gray", annotation_text=f"Target {target}")
 
     # Add current position marker
-    fig.add_vline(x=metrics['overs_completed'], line_dash="dash", line_color="green")
-    fig.add_annotation(x=metrics['overs_completed'], y=max(timeline['Projected Score']),
+    fig.add_vline(x=balls_now / 6, line_dash="dash", line_color="green")
+    fig.add_annotation(x=balls_now / 6, y=timeline['Projected Score'].max(),
                        text="Current Position", showarrow=True, arrowhead=1)
 
     # Update layout
@@ -811,29 +907,62 @@ def display_prediction_timeline(metrics, win_prob):
             x=1
         )
     )
+    return fig, len(fig.to_json())
 
-    st.plotly_chart(fig, use_container_width=True)
 
+def display_prediction_timeline(batting_team, venue, metrics):
+    """Display a visual timeline of the match progression against the par score"""
+    st.markdown("### ⏳ Match Progression Timeline")
+
+    recorder = get_recorder()
+    balls_now = metrics['total_balls'] - metrics['balls_left']
+
+    with recorder.stage('plot_build'):
+        fig, nbytes = prediction_timeline_figure(batting_team, venue, metrics['current_score'], metrics['crr'],
+                                                 metrics['target'], metrics['wickets_in_hand'], balls_now,
+                                                 metrics['total_balls'])
 
-def display_prediction_results(batting_team, bowling_team, win_prob, metrics):
+    with recorder.stage('plot_render'):
+        render_figure(fig, nbytes)
+
+    # Runs needed by the end of this over to stay at or above 50%
+    planner = load_planner(venue, batting_team, metrics['total_balls'])
+    over_end = min(metrics['total_balls'], (balls_now // 6 + 1) * 6)
+    par_next = planner.par_score(metrics['target'], metrics['total_balls'] - over_end, metrics['wickets_in_hand'])
+    chance = planner.win_probability(metrics['balls_left'], metrics['runs_left'], metrics['wickets_in_hand'])
+    needed = max(int(par_next) - metrics['current_score'], 0)
+    st.caption(f"Par score: the score that keeps a 50% chance at each over with {metrics['wickets_in_hand']} "
+               f"wickets in hand, from per-ball outcome rates. {needed} more runs by the end of over "
+               f"{-(-over_end // 6)} keep the chase on par (par-model chance now {chance * 100:.0f}%).")
+
+
+def display_prediction_results(batting_team, bowling_team, venue, win_prob, metrics, explanation=None,
+                               interval=None):
     """Display the prediction results with advanced insights"""
     loss_prob = 1 - win_prob
 
     # Display team comparison first
     display_team_comparison(batting_team, bowling_team)
 
+    # Range of the individual tree votes, shown under the probability bar
+    interval_html = ''
+    if interval is not None:
+        interval_html = (f'<div style="margin-top: 0.5rem; color: #555;">80% range: '
+                         f'<strong>{interval[0] * 100:.1f}% – {interval[1] * 100:.1f}%</strong></div>')
+
     # Main prediction cards
     st.markdown("### 🎯 Win Probability Prediction")
     col1, col2 = st.columns(2)
 
     with col1:
-        st.markdown(f"""
+        render_html(f"""
         <div class="prediction-card" style="position: relative; border-top: 4px solid {TEAM_COLORS.get(batting_team, '#4CAF50')}">
             <div class="team-name">{batting_team}</div>
             <div class="probability-value">{win_prob * 100:.1f}%</div>
             <div class="progress-container">
                 <div class="progress-bar" style="width: {win_prob * 100}%"></div>
             </div>
+            {interval_html}
             <div style="margin-top: 1.5rem;">
                 <div style="display: flex; justify-content: space-between; margin-bottom: 0.5rem;">
                     <span style="font-weight: 600; color: #555;">Current Run Rate</span>
@@ -849,10 +978,10 @@ def display_prediction_results(batting_team, bowling_team, win_prob, metrics):
                 </div>
             </div>
         </div>
-        """, unsafe_allow_html=True)
+        """)
 
     with col2:
-        st.markdown(f"""
+        render_html(f"""
         <div class="prediction-card" style="position: relative; border-top: 4px solid {TEAM_COLORS.get(bowling_team, '#F44336')}">
             <div class="team-name">{bowling_team}</div>
             <div class="probability-value" style="background: linear-gradient(135deg, #F44336, #E91E63); -webkit-background-clip: text; -webkit-text-fill-color: transparent;">
@@ -876,13 +1005,16 @@ def display_prediction_results(batting_team, bowling_team, win_prob, metrics):
                 </div>
             </div>
         </div>
-        """, unsafe_allow_html=True)
+        """)
 
-    # Display impact factors
-    display_impact_factors(metrics)
+    # Display model contributions, or the raw impact factors when unavailable
+    if explanation is not None:
+        display_model_contributions(*explanation)
+    else:
+        display_impact_factors(metrics)
 
     # Display timeline visualization
-    display_prediction_timeline(metrics, win_prob)
+    display_prediction_timeline(batting_team, venue, metrics)
 
     # Match analysis with more detailed insights
     st.markdown('<div class="match-analysis">', unsafe_allow_html=True)
@@ -925,11 +1057,303 @@ def display_prediction_results(batting_team, bowling_team, win_prob, metrics):
     st.markdown("</div>", unsafe_allow_html=True)
 
 
-def main():
-    """Main app function"""
-    pipe = load_model()
-    sidebar_content()
+def predict_win_probability(pipe, input_df, recorder):
+    """Score one input row, timing the encoder and the model separately when possible
+
+    Returns the win probability and, for forest models, the 80% range of
+    the individual tree votes (None otherwise).
+    """
+    if isinstance(pipe, CompactPipeline):
+        with recorder.stage('encode'):
+            encoded = pipe.transform(input_df)
+        with recorder.stage('model'):
+            win_prob, low, high = pipe.forest.predict_interval(encoded)
+        return win_prob[0], (low[0], high[0])
+    if hasattr(pipe, 'named_steps'):
+        with recorder.stage('encode'):
+            encoded = pipe[:-1].transform(input_df)
+        with recorder.stage('model'):
+            return pipe[-1].predict_proba(encoded)[0][1], None
+    with recorder.stage('model'):
+        return pipe.predict_proba(input_df)[0][1], None
+
+
+@st.cache_data(max_entries=256)
+def win_probability_figure(_pipe, batting_team, bowling_team, venue, state_key):
+    """Projected outlook figure and its serialized size for one match state, None once the target is reached"""
+    params = dict(state_key)
+
+    # The current state, then the end of every later over assuming the scoring rate so far
+    # continues with no further wickets. Earlier overs aren't plotted: only their end state is known
+    balls_now = float(overs_to_balls(params['overs_completed']))
+    balls = np.concatenate([[balls_now], np.arange(6 * (balls_now // 6 + 1), params['total_balls'], 6)])
+    rate = params['current_score'] / balls_now if balls_now else 0
+    states = pd.DataFrame({
+        'batting_team': batting_team,
+        'bowling_team': bowling_team,
+        'venue': venue,
+        'target': params['target'],
+        'current_score': np.round(params['current_score'] + rate * (balls - balls_now)),
+        'wickets': params['wickets'],
+        'balls': balls,
+        'total_balls': params['total_balls'],
+        'dot_balls': np.round(params['dot_balls'] / max(balls_now, 1) * balls),
+        'last_ball_runs': params['last_ball_runs'],
+        'top_batsman_playing': params['top_batsman_playing'],
+    })
+    states = states[states['current_score'] < params['target']]
+    if states.empty:
+        return None
+
+    X = build_model_input(states)
+    win_prob, low, high = _pipe.predict_interval(X)
+    prior = load_prematch_model()
+    if prior is not None:
+        weight, prior_prob = prior.blend_terms(X, params['chaser_won_toss'])
+        win_prob, low, high = (p + weight * (prior_prob - p) for p in (win_prob, low, high))
+    overs = states['balls'] / 6
+    color = TEAM_COLORS.get(batting_team, '#4CAF50')
+
+    fig = go.Figure([
+        go.Scatter(x=overs, y=high * 100, mode='lines', line=dict(width=0), showlegend=False, hoverinfo='skip'),
+        go.Scatter(x=overs, y=low * 100, mode='lines', line=dict(width=0), fill='tonexty',
+                   fillcolor='rgba(76, 175, 80, 0.2)', name='80% tree-vote range'),
+        go.Scatter(x=overs, y=win_prob * 100, mode='lines+markers', line=dict(color=color, width=3),
+                   name=f'{batting_team} win %'),
+    ])
+    fig.add_vline(x=balls_now / 6, line_dash="dash", line_color="green", annotation_text="Now")
+    fig.update_layout(
+        title="Projected Win Probability by Over",
+        xaxis_title="Overs",
+        yaxis_title="Win Probability (%)",
+        yaxis_range=[0, 100],
+        plot_bgcolor='rgba(255,255,255,0.9)',
+        paper_bgcolor='rgba(255,255,255,0.5)',
+        legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1)
+    )
+    return fig, len(fig.to_json())
+
+
+def display_win_probability_timeline(pipe, batting_team, bowling_team, venue, params):
+    """Win probability over the innings with the tree-vote band, scored in one batch"""
+    figure = win_probability_figure(pipe, batting_team, bowling_team, venue, tuple(sorted(params.items())))
+    if figure is None:
+        return
+
+    st.markdown("### 📉 Win Probability Outlook")
+    render_figure(*figure)
+    st.caption("Projected from the current ball, assuming the scoring rate so far continues with no "
+               "further wickets. Shaded band: spread of the individual trees' votes.")
+
+
+def run_prediction(pipe, batting_team, bowling_team, venue, metrics, params, recorder):
+    """Build the input, score it and render the results, timing each stage"""
+    with recorder.stage('dataframe'):
+        input_df = create_input_dataframe(batting_team, bowling_team, venue, metrics)
+
+    win_prob, interval = predict_win_probability(pipe, input_df, recorder)
+
+    # Early in the chase the pre-match prior still carries weight
+    prior = load_prematch_model()
+    prematch = None
+    if prior is not None:
+        with recorder.stage('prior'):
+            weight, prior_prob = prior.blend_terms(input_df, params['chaser_won_toss'])
+            blended = win_prob + weight[0] * (prior_prob[0] - win_prob)
+            if interval is not None:
+                interval = tuple(p + weight[0] * (prior_prob[0] - p) for p in interval)
+            prematch = (blended - win_prob, prior_prob[0])
+            win_prob = blended
+
+    monitor = get_drift_monitor()
+    if monitor is not None:
+        with recorder.stage('drift'):
+            monitor.update(input_df)
+
+    # Contributions are optional: a model or input row the explainer can't handle is logged
+    # (and shown in the admin panel) and falls back to the static impact cards
+    explanation = None
+    try:
+        if load_explainer() is not None:
+            with recorder.stage('explain'):
+                input_row = input_df.iloc[0].to_dict()
+                contributions = dict(explain_state(tuple(input_row[col] for col in MODEL_FEATURES)))
+                if prematch is not None:
+                    contributions['prematch'], input_row['prematch'] = prematch
+                explanation = (contributions, input_row)
+    except (AttributeError, IndexError, KeyError, TypeError, ValueError) as exc:
+        logger.warning("Feature contributions unavailable, showing static impact cards", exc_info=True)
+        st.session_state['explain_error'] = f"{type(exc).__name__}: {exc}"
+
+    # Display results
+    st.markdown("---")
+    with recorder.stage('render'):
+        display_prediction_results(batting_team, bowling_team, venue, win_prob, metrics, explanation, interval)
+        if isinstance(pipe, CompactPipeline):
+            display_win_probability_timeline(pipe, batting_team, bowling_team, venue, params)
+    return win_prob
+
+
+def display_first_innings_results(batting_team, bowling_team, win_prob, total_range, params):
+    """Display the projected total and win probability while the target is being set"""
+    low, median, high = total_range
+
+    st.markdown("### 🎯 Projected Total & Win Probability")
+    col1, col2 = st.columns(2)
 
+    with col1:
+        st.markdown(f"""
+        <div class="prediction-card" style="border-top: 4px solid {TEAM_COLORS.get(batting_team, '#4CAF50')}">
+            <div class="team-name">{batting_team} Projected Total</div>
+            <div class="probability-value">{median:.0f}</div>
+            <div style="margin-top: 1.5rem; display: flex; justify-content: space-between;">
+                <span style="font-weight: 600; color: #555;">80% Range</span>
+                <span style="font-weight: 700; color: {TEAM_COLORS.get(batting_team, '#4CAF50')};">{low:.0f} – {high:.0f}</span>
+            </div>
+            <div style="display: flex; justify-content: space-between;">
+                <span style="font-weight: 600; color: #555;">Current Score</span>
+                <span style="font-weight: 700; color: {TEAM_COLORS.get(batting_team, '#4CAF50')};">{params['current_score']}/{params['wickets']}</span>
+            </div>
+        </div>
+        """, unsafe_allow_html=True)
+
+    with col2:
+        st.markdown(f"""
+        <div class="prediction-card" style="border-top: 4px solid {TEAM_COLORS.get(bowling_team, '#F44336')}">
+            <div class="team-name">{batting_team} Win Probability</div>
+            <div class="probability-value">{win_prob * 100:.1f}%</div>
+            <div class="progress-container">
+                <div class="progress-bar" style="width: {win_prob * 100}%"></div>
+            </div>
+            <div style="margin-top: 1.5rem; display: flex; justify-content: space-between;">
+                <span style="font-weight: 600; color: #555;">{bowling_team}</span>
+                <span style="font-weight: 700; color: {TEAM_COLORS.get(bowling_team, '#F44336')};">{(1 - win_prob) * 100:.1f}%</span>
+            </div>
+        </div>
+        """, unsafe_allow_html=True)
+
+
+def run_first_innings_prediction(first_model, batting_team, bowling_team, venue, params, recorder):
+    """Score a first innings state and render the projected total"""
+    if first_model is None:
+        raise FileNotFoundError(f"'{FIRST_INNINGS_MODEL_PATH}' not found, run the training script first")
+
+    with recorder.stage('dataframe'):
+        state = pd.DataFrame([{**params, 'batting_team': batting_team,
+                               'bowling_team': bowling_team, 'venue': venue}])
+        input_df = build_first_innings_input(state)
+
+    with recorder.stage('model'):
+        totals = first_model.predict_total_quantiles(input_df)[0]
+        win_prob = first_model.predict_proba(input_df)[0][1]
+
+    st.markdown("---")
+    with recorder.stage('render'):
+        total_range = np.interp([0.1, 0.5, 0.9], first_model.quantiles, totals)
+        display_first_innings_results(batting_team, bowling_team, win_prob, total_range, params)
+    return win_prob
+
+
+@fragment
+def display_admin_panel(recorder):
+    """Sidebar panel with rolling latency, payload and drift stats and on-demand profiling"""
+    with st.expander("🛠️ Latency Admin", expanded=False):
+        summary = recorder.summary()
+        if summary:
+            stats = pd.DataFrame(summary).T.drop(columns='histogram')
+            st.dataframe(stats.astype(float).round(3), use_container_width=True)
+
+            stage = st.selectbox("Histogram", list(summary), key='admin_stage_select')
+            st.bar_chart(pd.Series(summary[stage]['histogram'], name='requests'))
+        else:
+            st.caption("No predictions recorded yet")
+
+        # 'rerun' is a full script run, 'live_fragment' a partial rerun of the live page
+        payload = get_payload_meter().summary()
+        if payload:
+            st.caption("Payload per run (markup and figure JSON)")
+            st.dataframe(pd.DataFrame(payload).T.astype(float).round(2), use_container_width=True)
+
+        monitor = get_drift_monitor()
+        if monitor is not None:
+            drift = monitor.report()
+            st.caption(f"Input drift vs training (PSI, {drift.attrs['observations']:,.0f} weighted predictions)")
+            st.dataframe(drift.round(3), use_container_width=True)
+            drifted = drift.index[drift['status'] == 'drift']
+            if len(drifted):
+                st.warning(f"Drift detected: {', '.join(drifted)}")
+
+        if 'explain_error' in st.session_state:
+            st.caption(f"Last contribution failure (static impact cards shown): {st.session_state['explain_error']}")
+
+        st.button("Profile next prediction", key='profile_button',
+                  on_click=lambda: st.session_state.update(profile_next=True))
+        if 'profile_report' in st.session_state:
+            st.code(st.session_state['profile_report'], language=None)
+            st.download_button("Download trace", st.session_state['profile_report'],
+                               file_name='prediction_profile.txt', key='profile_download')
+
+
+def display_historical_match():
+    """Replay any past match from its precomputed curve, without calling the model"""
+    st.markdown("""
+    <div class="header-card">
+        <h1 style="margin-bottom: 0;">📜 Historical Match Replay</h1>
+        <p style="color: #555; font-size: 1.1rem; margin-bottom: 0;">
+            Ball-by-ball win probability of every chase in the IPL archive
+        </p>
+    </div>
+    """, unsafe_allow_html=True)
+
+    curves = load_match_curves()
+    if curves is None:
+        st.info(f"No precomputed curves found in '{MATCH_CURVES_DIR}'. Run `python match_curves.py` first.")
+        return
+
+    matches = load_historical_matches()
+    matches = matches[matches.index.isin(np.asarray(curves.match_id))]
+    match_id = st.selectbox(
+        "Match 🏟️",
+        matches.index,
+        format_func=lambda i: f"{matches.at[i, 'date']} · {matches.at[i, 'batting_first']} vs "
+                              f"{matches.at[i, 'chasing']} ({matches.at[i, 'venue']})",
+        key='historical_match_select'
+    )
+    if match_id is None:
+        return
+
+    match = matches.loc[match_id]
+    curve = curves.curve(match_id)
+    overs = curve['ball'] / 6
+    color = TEAM_COLORS.get(match['chasing'], '#4CAF50')
+
+    fig = go.Figure(go.Scatter(
+        x=overs, y=curve['win_prob'] * 100, mode='lines', line=dict(color=color, width=3),
+        name=f"{match['chasing']} win %",
+        customdata=np.column_stack([curve['score'], curve['wickets']]),
+        hovertemplate="Over %{x:.1f}<br>%{customdata[0]}/%{customdata[1]}<br>Win %{y:.1f}%<extra></extra>"
+    ))
+    fell = curve['wickets'].diff().fillna(curve['wickets']) > 0
+    fig.add_trace(go.Scatter(x=overs[fell], y=curve['win_prob'][fell] * 100, mode='markers',
+                             marker=dict(color='#F44336', size=9, symbol='x'), name='Wicket'))
+    fig.add_hline(y=50, line_dash="dot", line_color="gray")
+    fig.update_layout(
+        title=f"{match['chasing']} chasing {match['target_runs']:.0f} against {match['batting_first']}",
+        xaxis_title="Overs",
+        yaxis_title="Win Probability (%)",
+        yaxis_range=[0, 100],
+        plot_bgcolor='rgba(255,255,255,0.9)',
+        paper_bgcolor='rgba(255,255,255,0.5)',
+        legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1)
+    )
+    st.plotly_chart(fig, use_container_width=True)
+    result = match['result'] if pd.isnull(match['result_margin']) else \
+        f"{match['winner']} won by {match['result_margin']:.0f} {match['result']}"
+    st.caption(f"Result: {result}. Curve precomputed with {curves.meta.get('model', 'the trained model')}.")
+
+
+def display_live_header():
+    """Title card of the live prediction page"""
     st.markdown("""
     <div class="header-card">
         <div style="display: flex; align-items: center; margin-bottom: 1rem;">
@@ -944,6 +1368,19 @@ def main():
     </div>
     """, unsafe_allow_html=True)
 
+
+@fragment
+def display_live_prediction(recorder):
+    """Inputs and prediction; changing a widget here reruns only this fragment"""
+    with recorder.stage('live_fragment'), get_payload_meter().run('live_fragment'):
+        live_prediction(recorder)
+
+
+def live_prediction(recorder):
+    """Match inputs, derived metrics and the prediction for the live page"""
+    # Forest models are served compacted so every prediction also gets its tree-vote range
+    pipe = load_model()
+
     # Main input section with enhanced layout
     # Replace your existing "Match Setup" expander section with this code:
 
@@ -990,14 +1427,46 @@ def main():
             key='bowling_team_select'
         )
 
-        target = st.number_input(
-            "Target Score 🎯",
-            min_value=1,
-            value=180,
-            help="First innings total being chased",
-            key='target_input'
+        toss_winner = st.selectbox(
+            "Toss Won By 🪙",
+            [batting_team, bowling_team],
+            help="Feeds the pre-match prior (head-to-head, venue and toss), which fades as the chase goes on",
+            key='toss_select'
         )
 
+        innings = st.radio(
+            "Innings 🔄",
+            ['2nd Innings (Chasing)', '1st Innings (Setting Target)'],
+            horizontal=True,
+            help="Predict during the chase or while the target is being set",
+            key='innings_radio'
+        )
+        chasing = innings.startswith('2nd')
+
+        col3, col4 = st.columns(2)
+
+        with col3:
+            target = st.number_input(
+                "Target Score 🎯",
+                min_value=1,
+                value=180,
+                help="First innings total being chased (revised target minus one after rain)",
+                disabled=not chasing,
+                key='target_input'
+            )
+
+        with col4:
+            allotted_overs = st.number_input(
+                "Overs in Innings 🌧️",
+                min_value=1.0,
+                max_value=20.0,
+                value=20.0,
+                step=0.1,
+                format="%.1f",
+                help="Reduce for rain-shortened (Duckworth-Lewis) innings, e.g. 9.2 = 9 overs and 2 balls",
+                key='allotted_overs_input'
+            )
+
     # Match progress section with enhanced visualization
     with st.expander("📊 Match Progress Tracker", expanded=True):
         col5, col6, col7 = st.columns(3)
@@ -1025,7 +1494,7 @@ def main():
                 0.0, 20.0, 10.0,
                 step=0.1,
                 format="%.1f",
-                help="Overs bowled so far",
+                help="Overs bowled so far (10.3 = 10 overs and 3 balls)",
                 key='overs_slider'
             )
 
@@ -1046,7 +1515,7 @@ def main():
             """, unsafe_allow_html=True)
 
         with progress_col2:
-            over_progress = overs_completed / 20.0
+            over_progress = min(1.0, float(overs_to_balls(overs_completed) / overs_to_balls(allotted_overs)))
             st.markdown(f"""
             <div style="margin-top: 1rem;">
                 <div style="display: flex; justify-content: space-between; margin-bottom: 0.5rem;">
@@ -1061,7 +1530,7 @@ def main():
 
     # Advanced options expander
     with st.expander("🔍 Advanced Parameters", expanded=False):
-        col8, col9 = st.columns(2)
+        col8, col9, col10 = st.columns(3)
 
         with col8:
             top_batsman_playing = st.checkbox(
@@ -1081,24 +1550,46 @@ def main():
                 key='partnership_slider'
             )
 
+        with col10:
+            dot_ball_pct = st.slider(
+                "Dot Ball % 🚫",
+                min_value=0,
+                max_value=100,
+                value=35,
+                help="Share of balls in the chase so far with no runs scored",
+                key='dot_ball_slider'
+            )
+            last_ball_runs = st.selectbox(
+                "Runs Off Last Ball 🏃",
+                [0, 1, 2, 3, 4, 5, 6, 7],
+                index=1,
+                help="Runs (including extras) scored off the most recent delivery",
+                key='last_ball_select'
+            )
+
     # Calculate all metrics
     params = {
         'target': target,
         'current_score': current_score,
         'wickets': wickets,
         'overs_completed': overs_completed,
+        'total_balls': int(overs_to_balls(allotted_overs)),
+        'dot_balls': round(dot_ball_pct / 100 * float(overs_to_balls(overs_completed))),
+        'last_ball_runs': last_ball_runs,
         'top_batsman_playing': 1 if top_batsman_playing else 0,
-        'recent_partnership': recent_partnership
+        'recent_partnership': recent_partnership,
+        'chaser_won_toss': int(toss_winner == batting_team)
     }
 
-    metrics = calculate_advanced_metrics(params)
+    with recorder.stage('metrics'):
+        metrics = calculate_advanced_metrics(params)
 
     # Ensure we have valid match situation before predicting
     valid_prediction = True
     if metrics['balls_left'] <= 0:
         st.warning("❌ Match is already completed (no balls left)")
         valid_prediction = False
-    elif metrics['runs_left'] <= 0:
+    elif chasing and metrics['runs_left'] <= 0:
         st.warning("❌ Batting team has already reached the target")
         valid_prediction = False
 
@@ -1116,20 +1607,19 @@ def main():
             st.rerun()  # Changed from st.experimental_rerun() to st.rerun()
 
     if predict_clicked and valid_prediction:
-        input_df = create_input_dataframe(
-            batting_team,
-            bowling_team,
-            venue,
-            metrics
-        )
-
         try:
             with st.spinner('🧠 Analyzing match dynamics...'):
-                win_prob = pipe.predict_proba(input_df)[0][1]
-
-                # Display results
-                st.markdown("---")
-                display_prediction_results(batting_team, bowling_team, win_prob, metrics)
+                if chasing:
+                    args = (pipe, batting_team, bowling_team, venue, metrics, params, recorder)
+                    predict = run_prediction
+                else:
+                    args = (load_first_innings_model(), batting_team, bowling_team, venue, params, recorder)
+                    predict = run_first_innings_prediction
+
+                if st.session_state.pop('profile_next', False):
+                    win_prob, st.session_state['profile_report'] = profile_call(predict, *args)
+                else:
+                    win_prob = predict(*args)
 
                 # Add confetti effect for high confidence predictions
                 if win_prob > 0.85 or win_prob < 0.15:
@@ -1140,5 +1630,23 @@ def main():
             st.error("Please check your inputs and try again")
 
 
+def main():
+    """Main app function"""
+    recorder = get_recorder()
+    with recorder.stage('rerun'), get_payload_meter().run('rerun'):
+        render_html(APP_CSS)
+        sidebar_content()
+        page = st.sidebar.radio("Page", ['Live Prediction', 'Historical Match'], key='page_radio')
+        if page == 'Historical Match':
+            display_historical_match()
+        else:
+            display_live_header()
+            display_live_prediction(recorder)
+
+        # Fragments write to the sidebar only when called inside it
+        with st.sidebar:
+            display_admin_panel(recorder)
+
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,50 @@
+"""The app's match-state to model-input path, kept free of Streamlit
+
+app.py turns the sidebar inputs into params, calculate_advanced_metrics()
+into the metrics shown in the results cards and create_input_dataframe()
+into the row the model scores. parity.py replays training states through
+the same two functions.
+"""
+import pandas as pd
+
+from features import compute_chase_metrics
+
+
+def calculate_advanced_metrics(params):
+    """Calculate all advanced metrics with the feature code shared with training"""
+    shared = compute_chase_metrics(params, fill_value=0)
+    metrics = {key: value.item() for key, value in shared.items()}
+
+    # Counts are shown as integers in the results cards
+    for key in ['balls_left', 'runs_left', 'wickets', 'wickets_in_hand', 'current_score']:
+        metrics[key] = int(metrics[key])
+
+    metrics.update({
+        'recent_partnership': params.get('recent_partnership', 30),
+        'target': params['target'],
+        'overs_completed': params['overs_completed'],
+        'total_balls': params['total_balls']
+    })
+    return metrics
+
+
+def create_input_dataframe(batting_team, bowling_team, venue, metrics):
+    """Create the input dataframe matching the training data structure exactly"""
+    return pd.DataFrame({
+        'batting_team': [batting_team],
+        'bowling_team': [bowling_team],
+        'venue': [venue],
+        'current_score': [metrics['current_score']],
+        'wickets': [metrics['wickets']],
+        'balls_left': [metrics['balls_left']],
+        'runs_left': [metrics['runs_left']],
+        'crr': [metrics['crr']],
+        'rrr': [metrics['rrr']],
+        'pressure_index': [metrics['pressure_index']],
+        'momentum_shift_index': [metrics['momentum_shift_index']],
+        'dot_ball_percent': [metrics['dot_ball_percent']],
+        'wickets_in_hand': [metrics['wickets_in_hand']],
+        'top_batsman_playing': [metrics['top_batsman_playing']],
+        # Not a model feature: phase routing and the prior read the allotted balls
+        'total_balls': [metrics['total_balls']]
+    })
@@ -0,0 +1,315 @@
+"""Compact, memory-mappable storage for the random forest pipeline
+
+Usage:
+    python compact_model.py advanced_pipe.pkl advanced_pipe_compact [--tol 0.0]
+"""
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import time
+
+import joblib
+import numpy as np
+
+ARRAYS = ['feature', 'threshold', 'left', 'right', 'value', 'roots', 'tree_weight']
+DTYPES = {
+    'feature': np.int16,
+    'threshold': np.float32,
+    'left': np.int32,
+    'right': np.int32,
+    'value': np.float32,
+    'roots': np.int32,
+    'tree_weight': np.float32,
+}
+
+
+class CompactForest:
+    """Forest stored as flat node arrays, evaluated for all trees at once"""
+
+    def __init__(self, arrays, max_depth, classes):
+        for name in ARRAYS:
+            setattr(self, name, arrays[name])
+        self.max_depth = max_depth
+        self.classes_ = np.asarray(classes)
+
+    @property
+    def n_nodes(self):
+        return len(self.feature)
+
+    def apply(self, X):
+        """Return the leaf index reached in every tree, shape (n_trees, n_samples)"""
+        X = np.asarray(X, dtype=np.float32)
+        rows = np.arange(X.shape[0])
+        node = np.repeat(np.asarray(self.roots)[:, None], X.shape[0], axis=1)
+        for _ in range(self.max_depth):
+            feature = self.feature[node]
+            leaf = feature < 0
+            if leaf.all():
+                break
+            x = X[rows, np.maximum(feature, 0)]
+            child = np.where(x <= self.threshold[node], self.left[node], self.right[node])
+            node = np.where(leaf, node, child)
+        return node
+
+    def tree_proba(self, X):
+        """Positive-class probability of every tree, shape (n_trees, n_samples)"""
+        return self.value[self.apply(X)]
+
+    def predict_proba(self, X):
+        weights = np.asarray(self.tree_weight)
+        proba = weights @ self.tree_proba(X) / weights.sum()
+        return np.column_stack([1 - proba, proba])
+
+    def predict(self, X):
+        return self.classes_[(self.predict_proba(X)[:, 1] > 0.5).astype(int)]
+
+    def predict_interval(self, X, coverage=0.8):
+        """Mean probability and the central coverage interval of the tree votes
+
+        All trees are evaluated in the same pass as predict_proba; the
+        interval is a weighted quantile of the per-tree probabilities.
+        """
+        votes = self.tree_proba(X)
+        weights = np.asarray(self.tree_weight, dtype=float)
+        mean = weights @ votes / weights.sum()
+
+        order = np.argsort(votes, axis=0)
+        sorted_votes = np.take_along_axis(votes, order, axis=0)
+        cumulative = np.cumsum(weights[order], axis=0) / weights.sum()
+        tail = (1 - coverage) / 2
+        cols = np.arange(votes.shape[1])
+        low = sorted_votes[(cumulative < tail).sum(axis=0), cols]
+        high = sorted_votes[np.minimum((cumulative < 1 - tail).sum(axis=0), len(votes) - 1), cols]
+        return mean, low, high
+
+
+class CompactPipeline:
+    """Fitted preprocessor followed by a CompactForest"""
+
+    def __init__(self, preprocessor, forest):
+        self.preprocessor = preprocessor
+        self.forest = forest
+        self.classes_ = forest.classes_
+
+    def transform(self, X):
+        Xt = self.preprocessor.transform(X)
+        if hasattr(Xt, 'toarray'):
+            Xt = Xt.toarray()
+        return np.asarray(Xt, dtype=np.float32)
+
+    def predict_proba(self, X):
+        return self.forest.predict_proba(self.transform(X))
+
+    def predict(self, X):
+        return self.forest.predict(self.transform(X))
+
+    def predict_interval(self, X, coverage=0.8):
+        return self.forest.predict_interval(self.transform(X), coverage)
+
+
+def _float32_floor(values):
+    """Largest float32 at or below each value
+
+    sklearn compares float32 features with float64 thresholds; rounding
+    the thresholds down keeps x <= threshold unchanged for every float32 x.
+    """
+    rounded = values.astype(np.float32)
+    return np.where(rounded > values, np.nextafter(rounded, np.float32(-np.inf)), rounded)
+
+
+def _tree_arrays(tree, positive):
+    """Extract one fitted sklearn tree as local node arrays"""
+    leaf = tree.children_left == -1
+    counts = tree.value[:, 0, :]
+    return {
+        'feature': np.where(leaf, -1, tree.feature),
+        'threshold': _float32_floor(tree.threshold),
+        'left': tree.children_left,
+        'right': tree.children_right,
+        'value': counts[:, positive] / counts.sum(axis=1),
+    }
+
+
+def _prune_tree(tree, tol):
+    """Collapse splits whose two leaves agree within tol and drop dead nodes"""
+    feature = tree['feature'].copy()
+    left, right, value = tree['left'], tree['right'], tree['value']
+
+    # Bottom-up collapse, one tree level per pass
+    while True:
+        internal = np.flatnonzero(feature >= 0)
+        l, r = left[internal], right[internal]
+        collapse = (feature[l] < 0) & (feature[r] < 0) & (np.abs(value[l] - value[r]) <= tol)
+        if not collapse.any():
+            break
+        feature[internal[collapse]] = -1
+
+    # Keep only nodes still reachable from the root
+    reachable = np.zeros(len(feature), dtype=bool)
+    frontier = np.array([0])
+    depth = 0
+    while True:
+        reachable[frontier] = True
+        frontier = frontier[feature[frontier] >= 0]
+        if not frontier.size:
+            break
+        frontier = np.concatenate([left[frontier], right[frontier]])
+        depth += 1
+
+    keep = np.flatnonzero(reachable)
+    new_index = np.cumsum(reachable) - 1
+    internal = feature[keep] >= 0
+    return {
+        'feature': feature[keep],
+        'threshold': tree['threshold'][keep],
+        'left': np.where(internal, new_index[left[keep]], -1),
+        'right': np.where(internal, new_index[right[keep]], -1),
+        'value': value[keep],
+    }, depth
+
+
+def _tree_key(tree):
+    """Hash of a tree's cast arrays, used to merge identical trees"""
+    digest = hashlib.sha1()
+    for name in ['feature', 'threshold', 'left', 'right', 'value']:
+        digest.update(np.ascontiguousarray(tree[name], dtype=DTYPES[name]).tobytes())
+    return digest.hexdigest()
+
+
+def compact_forest(forest, tol=0.0):
+    """Convert a fitted RandomForestClassifier into a pruned CompactForest"""
+    if len(forest.classes_) != 2:
+        raise ValueError("Only binary forests can be compacted")
+
+    trees, weights, seen = [], [], {}
+    max_depth = 0
+    for estimator in forest.estimators_:
+        tree, depth = _prune_tree(_tree_arrays(estimator.tree_, 1), tol)
+        key = _tree_key(tree)
+        if key in seen:
+            weights[seen[key]] += 1
+            continue
+        seen[key] = len(trees)
+        trees.append(tree)
+        weights.append(1)
+        max_depth = max(max_depth, depth)
+
+    sizes = np.array([len(tree['feature']) for tree in trees])
+    roots = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+    if sizes.sum() > np.iinfo(np.int32).max:
+        raise ValueError("Forest too large for int32 node indices")
+
+    arrays = {
+        'feature': np.concatenate([tree['feature'] for tree in trees]),
+        'threshold': np.concatenate([tree['threshold'] for tree in trees]),
+        'left': np.concatenate([np.where(t['left'] < 0, -1, t['left'] + o) for t, o in zip(trees, roots)]),
+        'right': np.concatenate([np.where(t['right'] < 0, -1, t['right'] + o) for t, o in zip(trees, roots)]),
+        'value': np.concatenate([tree['value'] for tree in trees]),
+        'roots': roots,
+        'tree_weight': np.array(weights),
+    }
+    arrays = {name: np.ascontiguousarray(arrays[name], dtype=DTYPES[name]) for name in ARRAYS}
+    return CompactForest(arrays, max_depth, forest.classes_)
+
+
+def compact_pipeline(pipe, tol=0.0):
+    """Convert a fitted preprocessor + forest Pipeline into a CompactPipeline"""
+    if not hasattr(pipe, 'named_steps'):
+        raise TypeError(f"Expected a fitted Pipeline, got {type(pipe).__name__}")
+    forest = pipe.named_steps['model']
+    if not hasattr(forest, 'estimators_') or not hasattr(forest.estimators_[0], 'tree_'):
+        raise TypeError("Only random forest pipelines can be compacted")
+    return CompactPipeline(pipe.named_steps['preprocessor'], compact_forest(forest, tol))
+
+
+def save_compact(model, path):
+    """Write a CompactPipeline as raw .npy arrays plus a small metadata file"""
+    os.makedirs(path, exist_ok=True)
+    forest = model.forest
+    for name in ARRAYS:
+        np.save(os.path.join(path, f'{name}.npy'), getattr(forest, name))
+    joblib.dump(model.preprocessor, os.path.join(path, 'preprocessor.pkl'))
+    with open(os.path.join(path, 'meta.json'), 'w') as f:
+        json.dump({'max_depth': forest.max_depth, 'classes': forest.classes_.tolist()}, f)
+
+
+def load_compact(path, mmap_mode='r'):
+    """Load a CompactPipeline; arrays are memory-mapped and shared between processes"""
+    with open(os.path.join(path, 'meta.json')) as f:
+        meta = json.load(f)
+    arrays = {name: np.load(os.path.join(path, f'{name}.npy'), mmap_mode=mmap_mode) for name in ARRAYS}
+    forest = CompactForest(arrays, meta['max_depth'], meta['classes'])
+    return CompactPipeline(joblib.load(os.path.join(path, 'preprocessor.pkl')), forest)
+
+
+def memory_usage():
+    """Return resident memory of this process in MB (total, anonymous, file-backed)"""
+    usage = {'rss': 0.0, 'anon': 0.0, 'file': 0.0}
+    keys = {'VmRSS:': 'rss', 'RssAnon:': 'anon', 'RssFile:': 'file'}
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                parts = line.split()
+                if parts and parts[0] in keys:
+                    usage[keys[parts[0]]] = int(parts[1]) / 1024
+    except OSError:
+        import resource
+        usage['rss'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return usage
+
+
+def artifact_size(path):
+    """Size of a file or directory in MB"""
+    if os.path.isfile(path):
+        return os.path.getsize(path) / 1e6
+    return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path)) / 1e6
+
+
+def _measure_load(path):
+    """Load a model in a fresh process and return load time and memory
+
+    The libraries either artifact needs are imported before the first
+    snapshot, so the numbers are the model's own cost, not sklearn's.
+    """
+    import sklearn.compose, sklearn.ensemble, sklearn.pipeline, sklearn.preprocessing  # noqa: F401,E401
+    before = memory_usage()
+    start = time.perf_counter()
+    model = load_compact(path) if os.path.isdir(path) else joblib.load(path)
+    elapsed = time.perf_counter() - start
+    after = memory_usage()
+    del model
+    return elapsed, {key: after[key] - before[key] for key in after}
+
+
+def measure(path):
+    """Size, load time and RSS growth of a saved model, measured in a child process"""
+    with multiprocessing.get_context('spawn').Pool(1) as pool:
+        elapsed, memory = pool.apply(_measure_load, (path,))
+    return {'size_mb': artifact_size(path), 'load_s': elapsed, **{f'{k}_mb': v for k, v in memory.items()}}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compact advanced_pipe.pkl into memory-mappable arrays")
+    parser.add_argument('model', nargs='?', default='advanced_pipe.pkl')
+    parser.add_argument('output', nargs='?', default='advanced_pipe_compact')
+    parser.add_argument('--tol', type=float, default=0.0,
+                        help="Collapse sibling leaves whose probabilities differ by at most this much")
+    args = parser.parse_args()
+
+    pipe = joblib.load(args.model)
+    model = compact_pipeline(pipe, args.tol)
+    n_trees = len(pipe.named_steps['model'].estimators_)
+    n_nodes = sum(est.tree_.node_count for est in pipe.named_steps['model'].estimators_)
+    save_compact(model, args.output)
+    print(f"Trees: {n_trees} -> {len(model.forest.roots)}, nodes: {n_nodes} -> {model.forest.n_nodes}")
+
+    print(f"{'Artifact':<28}{'Size (MB)':>10}{'Load (s)':>10}{'RSS (MB)':>10}{'Anon (MB)':>11}")
+    for path in [args.model, args.output]:
+        row = measure(path)
+        print(f"{path:<28}{row['size_mb']:>10.2f}{row['load_s']:>10.3f}{row['rss_mb']:>10.1f}{row['anon_mb']:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""Drift monitoring of live model inputs against the training distribution
+
+The training script saves a profile of every model feature: quantile bin
+edges and bin shares for numeric features, category shares for
+batting_team/bowling_team/venue. At serving time DriftMonitor keeps one
+fixed-size, exponentially decayed histogram per feature over those same
+bins, so memory is constant and an update is a searchsorted per feature.
+Drift is scored with the population stability index (PSI) per feature.
+
+Usage:
+    python drift.py states.csv --profile training_profile.json
+"""
+import argparse
+import json
+import threading
+
+import numpy as np
+import pandas as pd
+
+from features import MODEL_FEATURES, build_model_input
+
+CATEGORICAL_FEATURES = ['batting_team', 'bowling_team', 'venue']
+# Bucket for categories never seen in training (new teams, new venues)
+UNSEEN = '<unseen>'
+
+# PSI above these is reported as moderate / significant drift
+PSI_WARN = 0.1
+PSI_ALERT = 0.25
+
+
+def build_profile(X, n_bins=10):
+    """Training distribution of every model feature, JSON-serializable"""
+    profile = {}
+    for col in MODEL_FEATURES:
+        values = X[col]
+        if col in CATEGORICAL_FEATURES:
+            shares = values.astype(str).value_counts(normalize=True)
+            profile[col] = {'kind': 'categorical', 'categories': shares.index.tolist() + [UNSEEN],
+                            'shares': shares.tolist() + [0.0]}
+            continue
+
+        values = values.to_numpy(dtype=float)
+        values = values[np.isfinite(values)]
+        # Interior quantile edges; values below the first or above the last fall in the end bins
+        edges = np.unique(np.quantile(values, np.linspace(0, 1, n_bins + 1)[1:-1]))
+        counts = np.bincount(np.searchsorted(edges, values, side='right'), minlength=len(edges) + 1)
+        profile[col] = {'kind': 'numeric', 'edges': edges.tolist(), 'shares': (counts / counts.sum()).tolist()}
+    return profile
+
+
+def save_profile(profile, path):
+    with open(path, 'w') as f:
+        json.dump(profile, f, indent=2)
+
+
+def load_profile(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def psi(expected, actual, eps=1e-4):
+    """Population stability index between two share vectors over the same bins"""
+    expected = np.clip(np.asarray(expected, dtype=float), eps, None)
+    actual = np.clip(np.asarray(actual, dtype=float), eps, None)
+    return float(np.sum((actual - expected) * np.log(actual / expected)))
+
+
+class DriftMonitor:
+    """Constant-memory histograms of live model inputs, compared to a training profile"""
+
+    def __init__(self, profile, half_life=5000, min_count=50):
+        self.profile = profile
+        # Weight of an observation halves after half_life newer ones
+        self.decay = 0.5 ** (1 / half_life)
+        self.min_count = min_count
+        self.features = [col for col in MODEL_FEATURES if col in profile]
+        self.edges = {col: np.asarray(profile[col]['edges']) for col in self.features
+                      if profile[col]['kind'] == 'numeric'}
+        self.codes = {col: {name: i for i, name in enumerate(profile[col]['categories'])}
+                      for col in self.features if profile[col]['kind'] == 'categorical'}
+        self.counts = {col: np.zeros(len(profile[col]['shares'])) for col in self.features}
+        self.n = 0.0
+        self.lock = threading.Lock()
+
+    def _bins(self, col, values):
+        if col in self.codes:
+            codes = self.codes[col]
+            return np.array([codes.get(str(v), codes[UNSEEN]) for v in values])
+        values = np.asarray(values, dtype=float)
+        return np.searchsorted(self.edges[col], values[np.isfinite(values)], side='right')
+
+    def update(self, X):
+        """Add the rows of a model input frame"""
+        bins = {col: self._bins(col, X[col].to_numpy()) for col in self.features}
+        decay = self.decay ** len(X)
+        with self.lock:
+            self.n = self.n * decay + len(X)
+            for col, b in bins.items():
+                counts = self.counts[col]
+                counts *= decay
+                counts += np.bincount(b, minlength=len(counts))
+
+    def report(self):
+        """PSI and drift status per feature, most drifted first"""
+        with self.lock:
+            n = self.n
+            shares = {col: counts / max(counts.sum(), 1e-12) for col, counts in self.counts.items()}
+
+        rows = []
+        for col in self.features:
+            value = psi(self.profile[col]['shares'], shares[col]) if n >= self.min_count else np.nan
+            if np.isnan(value):
+                status = 'warming up'
+            elif value >= PSI_ALERT:
+                status = 'drift'
+            elif value >= PSI_WARN:
+                status = 'watch'
+            else:
+                status = 'stable'
+            row = {'feature': col, 'psi': value, 'status': status}
+            if col in self.codes:
+                row['unseen_share'] = float(shares[col][self.codes[col][UNSEEN]])
+            rows.append(row)
+        report = pd.DataFrame(rows).set_index('feature').sort_values('psi', ascending=False)
+        report.attrs['observations'] = n
+        return report
+
+    def drifted(self):
+        """Features currently flagged as drifted"""
+        report = self.report()
+        return report.index[report['status'] == 'drift'].tolist()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check a batch of chase states for drift from training")
+    parser.add_argument('states', help="CSV of chase states (see score_matches.py)")
+    parser.add_argument('--profile', default='training_profile.json')
+    args = parser.parse_args()
+
+    monitor = DriftMonitor(load_profile(args.profile), half_life=np.inf, min_count=1)
+    monitor.update(build_model_input(pd.read_csv(args.states)))
+    report = monitor.report()
+    print(f"{report.attrs['observations']:,.0f} states against '{args.profile}'\n")
+    with pd.option_context('display.float_format', '{:.4f}'.format):
+        print(report)
+
+    drifted = report.index[report['status'] == 'drift']
+    if len(drifted):
+        print(f"\n❌ Drift (PSI >= {PSI_ALERT}): {', '.join(drifted)}")
+    else:
+        print("\n✅ No feature drifted")
+
+
+if __name__ == "__main__":
+    main()
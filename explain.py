@@ -0,0 +1,110 @@
+"""Per-prediction feature contributions from the random forest
+
+Path-based (Saabas) contributions: walking each tree from root to leaf,
+the change in positive-class probability at every split is credited to
+the split feature. Summed over the forest, bias + contributions equals
+the predicted probability exactly. All trees and rows are walked
+together on the CompactForest arrays, and one-hot columns are folded
+back into the original batting_team/bowling_team/venue features.
+
+Usage:
+    python explain.py states.csv explained.csv [--model advanced_pipe.pkl]
+"""
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from compact_model import CompactPipeline, compact_pipeline
+from features import build_model_input
+from score_matches import load_pipeline
+
+
+def _feature_groups(preprocessor):
+    """Original input feature behind every encoded column"""
+    names = list(preprocessor.feature_names_in_)
+    groups = []
+    for name, transformer, columns in preprocessor.transformers_:
+        if transformer == 'drop':
+            continue
+        columns = [names[c] if isinstance(c, (int, np.integer)) else c for c in columns]
+        if hasattr(transformer, 'categories_'):
+            for column, categories in zip(columns, transformer.categories_):
+                groups += [column] * len(categories)
+        else:
+            # 'passthrough', or the identity FunctionTransformer sklearn >= 1.4 stores for the remainder
+            groups += columns
+    return groups
+
+
+def forest_contributions(forest, X):
+    """Bias and per-encoded-column contributions, shape (n_samples, n_columns)"""
+    X = np.asarray(X, dtype=np.float32)
+    n_samples, n_columns = X.shape
+    rows = np.arange(n_samples)
+    weights = np.asarray(forest.tree_weight, dtype=float)
+    weights = (weights / weights.sum())[:, None]
+    roots = np.asarray(forest.roots)
+
+    node = np.repeat(roots[:, None], n_samples, axis=1)
+    bias = float(weights[:, 0] @ forest.value[roots])
+    contributions = np.zeros(n_samples * n_columns)
+    for _ in range(forest.max_depth):
+        feature = forest.feature[node]
+        split = feature >= 0
+        if not split.any():
+            break
+        feature = np.maximum(feature, 0)
+        x = X[rows, feature]
+        child = np.where(x <= forest.threshold[node], forest.left[node], forest.right[node])
+        child = np.where(split, child, node)
+        delta = (forest.value[child] - forest.value[node]) * weights
+        contributions += np.bincount((rows * n_columns + feature).ravel(), weights=delta.ravel(),
+                                     minlength=n_samples * n_columns)
+        node = child
+    return bias, contributions.reshape(n_samples, n_columns)
+
+
+class ForestExplainer:
+    """Explain a forest pipeline's win probability feature by feature"""
+
+    def __init__(self, model):
+        if not isinstance(model, CompactPipeline):
+            model = compact_pipeline(model)
+        self.model = model
+        groups = _feature_groups(model.preprocessor)
+        self.features = list(dict.fromkeys(groups))
+        # Sums encoded columns into their original feature
+        self.fold = np.zeros((len(groups), len(self.features)))
+        self.fold[np.arange(len(groups)), [self.features.index(g) for g in groups]] = 1
+
+    def explain(self, X):
+        """Contribution of each input feature for every row of model input X
+
+        Returns a DataFrame with one column per feature plus 'bias' and
+        'win_prob' (= bias + row sum of the feature columns).
+        """
+        bias, contributions = forest_contributions(self.model.forest, self.model.transform(X))
+        explained = pd.DataFrame(contributions @ self.fold, columns=self.features, index=X.index)
+        explained['bias'] = bias
+        explained['win_prob'] = bias + explained[self.features].sum(axis=1)
+        return explained
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Explain win probabilities for a batch of chase states")
+    parser.add_argument('input', help="CSV of chase states, e.g. one match replay (see score_matches.py)")
+    parser.add_argument('output', help="CSV to write contributions to")
+    parser.add_argument('--model', default='advanced_pipe.pkl',
+                        help="Pickled forest pipeline or compact model directory")
+    args = parser.parse_args()
+
+    states = pd.read_csv(args.input)
+    explainer = ForestExplainer(load_pipeline(args.model))
+    explained = explainer.explain(build_model_input(states))
+    states.join(explained.add_prefix('contrib_')).to_csv(args.output, index=False)
+    print(f"✅ Explained {len(states):,} states into '{args.output}'")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,295 @@
+"""Match-state features shared by training, the app and offline tools
+
+compute_innings_metrics() and compute_chase_metrics() are the single
+definition of every derived feature. Training feeds them cumulative
+per-ball state built with grouped cumsums (create_chase_features,
+create_first_innings_features); serving feeds them the state entered in
+the app or read by the bulk scorer.
+
+The per-ball outcome and phase definitions and the fixture schedule
+(who bats first, the chase target and allotted balls) live here too, for
+the synthetic data generator, the scenario planner, the pre-match prior
+and the app.
+"""
+import numpy as np
+import pandas as pd
+
+from venues import canonicalize_venues
+
+# Model input columns, in the order the pipeline was trained on
+MODEL_FEATURES = [
+    'batting_team', 'bowling_team', 'venue', 'current_score', 'wickets',
+    'balls_left', 'runs_left', 'crr', 'rrr', 'pressure_index',
+    'momentum_shift_index', 'dot_ball_percent', 'wickets_in_hand',
+    'top_batsman_playing'
+]
+
+# First innings model inputs: the chase features that don't need a target
+FIRST_INNINGS_FEATURES = [
+    'batting_team', 'bowling_team', 'venue', 'current_score', 'wickets',
+    'balls_left', 'crr', 'momentum_shift_index', 'dot_ball_percent',
+    'wickets_in_hand', 'top_batsman_playing'
+]
+
+# Balls in a full T20 innings
+TOTAL_BALLS = 120
+
+# Current franchise names; matches involving any other team (defunct
+# franchises) map to NaN and are dropped with the other incomplete rows
+TEAM_MAP = {
+    'Chennai Super Kings': 'Chennai Super Kings',
+    'Delhi Capitals': 'Delhi Capitals',
+    'Kolkata Knight Riders': 'Kolkata Knight Riders',
+    'Mumbai Indians': 'Mumbai Indians',
+    'Punjab Kings': 'Punjab Kings',
+    'Rajasthan Royals': 'Rajasthan Royals',
+    'Royal Challengers Bangalore': 'Royal Challengers Bangalore',
+    'Sunrisers Hyderabad': 'Sunrisers Hyderabad',
+    'Gujarat Titans': 'Gujarat Titans',
+    'Lucknow Super Giants': 'Lucknow Super Giants'
+}
+
+# Per-ball outcomes: wicket, dot, 1, 2, 3, 4, 6, extra (wide/no-ball, always the last)
+OUTCOME_RUNS = np.array([0, 0, 1, 2, 3, 4, 6, 0])
+OUTCOME_EXTRAS = np.array([0, 0, 0, 0, 0, 0, 0, 1])
+OUTCOME_WICKET = np.array([1, 0, 0, 0, 0, 0, 0, 0])
+
+# Outcome probabilities for powerplay (overs 1-6), middle (7-15), death (16-20)
+PHASE_PROBS = np.array([
+    [0.045, 0.430, 0.280, 0.050, 0.003, 0.130, 0.035, 0.027],
+    [0.045, 0.310, 0.410, 0.075, 0.003, 0.090, 0.042, 0.025],
+    [0.085, 0.270, 0.350, 0.070, 0.003, 0.120, 0.072, 0.030],
+])
+PHASE_OF_BALL = np.repeat([0, 1, 2], [36, 54, 30])
+EXTRA = len(OUTCOME_RUNS) - 1
+
+
+def normalize_teams(matches, deliveries):
+    """Map team names in matches and deliveries onto TEAM_MAP in place"""
+    for col in ['team1', 'team2', 'winner', 'toss_winner']:
+        matches[col] = matches[col].map(TEAM_MAP)
+    for col in ['batting_team', 'bowling_team']:
+        deliveries[col] = deliveries[col].map(TEAM_MAP)
+
+
+def overs_to_balls(overs):
+    """Convert overs in cricket notation (10.3 = 10 overs and 3 balls) to balls"""
+    overs = np.asarray(overs, dtype=float)
+    whole = np.floor(overs + 1e-9)
+    return whole * 6 + np.minimum(np.round((overs - whole) * 10), 6)
+
+
+def balls_to_overs(balls):
+    """Convert balls to overs in cricket notation"""
+    balls = np.asarray(balls)
+    return balls // 6 + (balls % 6) / 10
+
+
+def compute_innings_metrics(state, fill_value=None):
+    """Vectorized target-independent metrics over columns of innings states
+
+    state maps current_score, wickets, balls (or overs_completed in
+    cricket notation) and optionally total_balls (allotted balls, 120
+    unless overs were lost), dot_balls, last_ball_runs and
+    top_batsman_playing to scalars or equal-length arrays. Undefined
+    ratios (no balls bowled yet) are NaN as in training unless
+    fill_value is given.
+    """
+    current_score = np.asarray(state['current_score'], dtype=float)
+    wickets = np.asarray(state['wickets'], dtype=float)
+    if 'balls' in state:
+        balls = np.asarray(state['balls'], dtype=float)
+    else:
+        balls = overs_to_balls(state['overs_completed'])
+    total_balls = np.asarray(state.get('total_balls', TOTAL_BALLS), dtype=float)
+    dot_balls = np.asarray(state.get('dot_balls', 0), dtype=float)
+    last_ball_runs = np.asarray(state.get('last_ball_runs', 0), dtype=float)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        crr = current_score / (balls / 6)
+        dot_ball_percent = dot_balls / balls
+
+    metrics = {
+        'current_score': current_score,
+        'wickets': wickets,
+        'balls_left': total_balls - balls,
+        'crr': crr,
+        'momentum_shift_index': last_ball_runs - crr * (balls / 6),
+        'dot_ball_percent': dot_ball_percent,
+        'wickets_in_hand': 10 - wickets,
+        'top_batsman_playing': np.asarray(state.get('top_batsman_playing', 0)),
+    }
+    if fill_value is not None:
+        _fill_undefined(metrics, ['crr', 'momentum_shift_index', 'dot_ball_percent'], fill_value)
+    return metrics
+
+
+def compute_chase_metrics(state, fill_value=None):
+    """Vectorized chase metrics over columns of match states
+
+    Takes the same state as compute_innings_metrics plus the target.
+    Ratios with no balls left are inf/NaN as in training unless
+    fill_value is given.
+    """
+    metrics = compute_innings_metrics(state)
+    runs_left = np.asarray(state['target'], dtype=float) - metrics['current_score']
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rrr = runs_left / (metrics['balls_left'] / 6)
+        pressure_index = rrr / np.where(metrics['crr'] == 0, np.nan, metrics['crr'])
+
+    metrics.update({
+        'runs_left': runs_left,
+        'rrr': rrr,
+        'pressure_index': pressure_index,
+    })
+    if fill_value is not None:
+        _fill_undefined(metrics, ['crr', 'rrr', 'pressure_index', 'momentum_shift_index',
+                                  'dot_ball_percent'], fill_value)
+    return metrics
+
+
+def _fill_undefined(metrics, columns, fill_value):
+    for col in columns:
+        metrics[col] = np.where(np.isfinite(metrics[col]), metrics[col], fill_value)
+
+
+def _add_cumulative_state(innings, top_batsmen_df):
+    """Add the cumulative match state after every ball, grouped by match"""
+    match_id = innings['match_id']
+    innings['current_score'] = innings.groupby('match_id')['total_runs'].cumsum()
+    innings['wickets'] = innings['player_dismissed'].notnull().astype(int).groupby(match_id).cumsum()
+    innings['balls'] = innings.groupby('match_id').cumcount() + 1
+    innings['dot_balls'] = (innings['total_runs'] == 0).astype(int).groupby(match_id).cumsum()
+    innings['last_ball_runs'] = innings['total_runs']
+
+    # Player-specific feature
+    top_batsmen = set(top_batsmen_df['Player'].unique())
+    innings['top_batsman_playing'] = (
+        innings['batter'].isin(top_batsmen).astype(int).groupby(match_id).transform('max')
+    )
+
+
+def _add_teams_and_result(innings):
+    """Determine bowling team and whether the batting team won"""
+    innings['bowling_team'] = np.where(
+        innings['batting_team'] == innings['team1'],
+        innings['team2'], innings['team1']
+    )
+    innings['result'] = np.where(innings['batting_team'] == innings['winner'], 1, 0)
+
+
+def chase_terms(matches, first_innings_totals):
+    """Target and allotted balls of every chase, revised for reduced-overs matches
+
+    target follows the app's convention (runs to tie, i.e. the first
+    innings total). Where matches.csv has target_runs/target_overs (the
+    revised Duckworth-Lewis target for rain-affected games) they take
+    precedence over the ball-by-ball first innings total and 20 overs.
+    """
+    by_id = matches.set_index('id')
+    terms = first_innings_totals.rename('target').reset_index()
+    terms = terms[terms['match_id'].isin(by_id.index)]
+
+    if 'target_runs' in by_id.columns:
+        revised = by_id['target_runs'].reindex(terms['match_id']).to_numpy(dtype=float) - 1
+        terms['target'] = np.where(np.isnan(revised), terms['target'], revised)
+    terms['total_balls'] = TOTAL_BALLS
+    if 'target_overs' in by_id.columns:
+        overs = by_id['target_overs'].reindex(terms['match_id']).to_numpy(dtype=float)
+        terms['total_balls'] = np.where(np.isnan(overs), TOTAL_BALLS, overs_to_balls(np.nan_to_num(overs)))
+    return terms
+
+
+def match_schedule(matches, repeat=1):
+    """Batting-first and chasing teams, chase target and allotted balls for every match, repeated with new ids"""
+    bat_first = np.where(
+        matches['toss_decision'] == 'bat', matches['toss_winner'],
+        np.where(matches['toss_winner'] == matches['team1'], matches['team2'], matches['team1'])
+    )
+    chasing = np.where(bat_first == matches['team1'], matches['team2'], matches['team1'])
+    schedule = pd.DataFrame({
+        'match_id': matches['id'].to_numpy(),
+        'bat_first': bat_first,
+        'chasing': chasing,
+        'winner': matches['winner'].to_numpy(),
+        # Runs the chase needs to win; where NaN synth_deliveries uses its first innings total plus one
+        'target_runs': matches['target_runs'].to_numpy(dtype=float) if 'target_runs' in matches else np.nan,
+        'chase_balls': TOTAL_BALLS,
+    })
+    if 'target_overs' in matches.columns:
+        # Reduced-overs (rain-affected) chases get target_overs, as in chase_terms
+        overs = matches['target_overs'].to_numpy(dtype=float)
+        schedule['chase_balls'] = np.where(np.isnan(overs), TOTAL_BALLS, overs_to_balls(np.nan_to_num(overs)))
+        schedule['chase_balls'] = schedule['chase_balls'].clip(upper=TOTAL_BALLS).astype(int)
+    if repeat > 1:
+        offsets = np.repeat(np.arange(repeat), len(schedule)) * 10 ** (len(str(schedule['match_id'].max())))
+        schedule = pd.concat([schedule] * repeat, ignore_index=True)
+        schedule['match_id'] += offsets
+    return schedule
+
+
+def classify_deliveries(deliveries):
+    """Phase and outcome index of every row of a real deliveries frame"""
+    ball = deliveries.groupby(['match_id', 'inning']).cumcount().clip(upper=119)
+    phase = PHASE_OF_BALL[ball.to_numpy()]
+    runs = deliveries['total_runs'].to_numpy()
+    extras = deliveries['extra_runs'].to_numpy() > 0 if 'extra_runs' in deliveries else np.zeros(len(runs), bool)
+    outcome = np.select(
+        [deliveries['player_dismissed'].notnull().to_numpy(), extras, runs == 0, runs == 1, runs == 2,
+         runs == 3, (runs == 4) | (runs == 5)],
+        [0, 7, 1, 2, 3, 4, 5], default=6
+    )
+    return phase, outcome
+
+
+def create_chase_features(matches, deliveries, top_batsmen_df):
+    """Build per-ball second innings training rows from ball-by-ball data"""
+    first_innings = deliveries[deliveries['inning'] == 1]
+    first_innings_totals = first_innings.groupby('match_id')['total_runs'].sum()
+
+    second_innings = deliveries[deliveries['inning'] == 2]
+    second_innings = second_innings.merge(matches[['id', 'team1', 'team2', 'winner', 'venue']],
+                                          left_on='match_id', right_on='id')
+    second_innings = second_innings.merge(chase_terms(matches, first_innings_totals), on='match_id')
+
+    _add_cumulative_state(second_innings, top_batsmen_df)
+    for col, values in compute_chase_metrics(second_innings).items():
+        second_innings[col] = values
+    _add_teams_and_result(second_innings)
+
+    return second_innings
+
+
+def create_first_innings_features(matches, deliveries, top_batsmen_df):
+    """Build per-ball first innings training rows with the final innings total"""
+    first_innings = deliveries[deliveries['inning'] == 1]
+    first_innings = first_innings.merge(matches[['id', 'team1', 'team2', 'winner', 'venue']],
+                                        left_on='match_id', right_on='id')
+
+    _add_cumulative_state(first_innings, top_batsmen_df)
+    for col, values in compute_innings_metrics(first_innings).items():
+        first_innings[col] = values
+    first_innings['final_total'] = first_innings.groupby('match_id')['total_runs'].transform('sum')
+    _add_teams_and_result(first_innings)
+
+    return first_innings
+
+
+def _model_frame(df, metrics, columns):
+    data = {col: df[col].to_numpy() for col in ['batting_team', 'bowling_team']}
+    data['venue'] = canonicalize_venues(df['venue']).to_numpy()
+    for col in columns[3:]:
+        data[col] = np.broadcast_to(metrics[col], len(df))
+    # Allotted balls, for phase routing and the prior; the fitted pipelines ignore the extra column
+    data['total_balls'] = np.broadcast_to(df['total_balls'] if 'total_balls' in df else TOTAL_BALLS, len(df))
+    return pd.DataFrame(data, index=df.index, columns=columns + ['total_balls'])
+
+
+def build_model_input(df):
+    """Return the chase model input frame (plus total_balls) for a DataFrame of serving states"""
+    return _model_frame(df, compute_chase_metrics(df, fill_value=0), MODEL_FEATURES)
+
+
+def build_first_innings_input(df):
+    """Return the first innings model input frame (plus total_balls) for a DataFrame of serving states"""
+    return _model_frame(df, compute_innings_metrics(df, fill_value=0), FIRST_INNINGS_FEATURES)
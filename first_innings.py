@@ -0,0 +1,126 @@
+"""First innings engine: projected total distribution and win probability
+
+A gradient boosting regressor predicts the runs still to come from an
+in-progress first innings state. Out-of-fold residual quantiles per
+phase of the innings turn that point estimate into a distribution of
+final totals, and a logistic chase curve fitted on historical targets
+(matches.csv target_runs) turns each total into the chance it is
+defended. Everything is evaluated as (n_states, n_quantiles) arrays so
+a batch of states costs one regressor call.
+"""
+import numpy as np
+from sklearn.pipeline import Pipeline
+from sklearn.compose import ColumnTransformer
+from sklearn.preprocessing import OrdinalEncoder
+from sklearn.ensemble import HistGradientBoostingRegressor
+from sklearn.linear_model import LogisticRegression
+from sklearn.model_selection import GroupKFold, GroupShuffleSplit, cross_val_predict
+
+from features import TOTAL_BALLS
+
+CATEGORICAL_FEATURES = ['batting_team', 'bowling_team', 'venue']
+
+# Most boosting iterations tried; the count used is picked on held-out matches
+MAX_ITER = 300
+
+
+def build_total_pipeline(max_iter=MAX_ITER):
+    """Regressor for the runs still to be scored in the innings"""
+    preprocessor = ColumnTransformer([
+        ('cat', OrdinalEncoder(handle_unknown='use_encoded_value', unknown_value=-1,
+                               encoded_missing_value=-1), CATEGORICAL_FEATURES)
+    ], remainder='passthrough')
+
+    return Pipeline([
+        ('preprocessor', preprocessor),
+        ('model', HistGradientBoostingRegressor(
+            categorical_features=list(range(len(CATEGORICAL_FEATURES))),
+            max_iter=max_iter,
+            learning_rate=0.1,
+            early_stopping=False,
+            random_state=42
+        ))
+    ])
+
+
+def select_total_iterations(X, remaining, groups):
+    """Boosting iterations minimizing squared error on matches held out of X
+
+    The regressor's own early stopping validates on random rows, i.e. on
+    other balls of the matches it is fitting.
+    """
+    splitter = GroupShuffleSplit(n_splits=1, test_size=0.1, random_state=7)
+    fit_idx, val_idx = next(splitter.split(X, groups=groups))
+    pipe = build_total_pipeline().fit(X.iloc[fit_idx], remaining[fit_idx])
+    encoded = pipe[:-1].transform(X.iloc[val_idx])
+    errors = [np.mean((remaining[val_idx] - predicted) ** 2)
+              for predicted in pipe[-1].staged_predict(encoded)]
+    return int(np.argmin(errors)) + 1
+
+
+def chase_outcomes(matches):
+    """Targets and whether the chasing side won, from matches.csv rows"""
+    matches = matches.dropna(subset=['target_runs', 'winner', 'toss_winner', 'toss_decision'])
+    toss_winner_chases = matches['toss_decision'] == 'field'
+    other_team = np.where(matches['toss_winner'] == matches['team1'], matches['team2'], matches['team1'])
+    chasing_team = np.where(toss_winner_chases, matches['toss_winner'], other_team)
+    return matches['target_runs'].to_numpy(dtype=float), (chasing_team == matches['winner']).to_numpy()
+
+
+class FirstInningsModel:
+    """Projected final total distribution and batting-first win probability"""
+
+    def __init__(self, n_quantiles=19, n_phase_bins=10):
+        self.quantiles = np.linspace(0.05, 0.95, n_quantiles)
+        self.n_phase_bins = n_phase_bins
+
+    def _phase_bin(self, X):
+        """Share of the allotted balls still to come, in n_phase_bins bins"""
+        balls_left = np.asarray(X['balls_left'], dtype=float)
+        total_balls = np.asarray(X['total_balls'] if 'total_balls' in X else TOTAL_BALLS, dtype=float)
+        return np.clip((balls_left * self.n_phase_bins // total_balls).astype(int), 0, self.n_phase_bins - 1)
+
+    def fit(self, X, final_total, targets, chase_won, groups=None):
+        """Fit on first innings states (X), their final totals and historical chases"""
+        remaining = np.asarray(final_total, dtype=float) - np.asarray(X['current_score'], dtype=float)
+        self.n_iter_ = select_total_iterations(X, remaining, groups) if groups is not None else MAX_ITER
+
+        # Honest residuals: predictions from folds that never saw the match
+        cv = GroupKFold(n_splits=3) if groups is not None else 3
+        oof = cross_val_predict(build_total_pipeline(self.n_iter_), X, remaining, cv=cv, groups=groups)
+        residual = remaining - oof
+
+        phase = self._phase_bin(X)
+        overall = np.quantile(residual, self.quantiles)
+        self.residual_quantiles_ = np.array([
+            np.quantile(residual[phase == b], self.quantiles) if (phase == b).any() else overall
+            for b in range(self.n_phase_bins)
+        ])
+
+        self.regressor_ = build_total_pipeline(self.n_iter_).fit(X, remaining)
+
+        chase_curve = LogisticRegression().fit(np.asarray(targets).reshape(-1, 1), chase_won)
+        self.chase_coef_ = float(chase_curve.coef_[0, 0])
+        self.chase_intercept_ = float(chase_curve.intercept_[0])
+        self.classes_ = np.array([0, 1])
+        return self
+
+    def predict_total_quantiles(self, X):
+        """Final total at each of self.quantiles, shape (n_states, n_quantiles)"""
+        current_score = np.asarray(X['current_score'], dtype=float)
+        expected = current_score + self.regressor_.predict(X)
+        totals = expected[:, None] + self.residual_quantiles_[self._phase_bin(X)]
+        return np.maximum(totals, current_score[:, None])
+
+    def chase_probability(self, target):
+        """Historical chance of chasing down a target"""
+        return 1 / (1 + np.exp(-(self.chase_intercept_ + self.chase_coef_ * target)))
+
+    def predict_proba(self, X):
+        """Win probability of the team batting first, averaged over its total distribution"""
+        targets = np.round(self.predict_total_quantiles(X)) + 1
+        proba = 1 - self.chase_probability(targets).mean(axis=1)
+        return np.column_stack([1 - proba, proba])
+
+    def predict(self, X):
+        return (self.predict_proba(X)[:, 1] > 0.5).astype(int)
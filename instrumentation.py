@@ -0,0 +1,222 @@
+"""Latency instrumentation for the prediction path
+
+Stages are timed with LatencyRecorder.stage() and kept in fixed-size
+rolling windows. PayloadMeter does the same for the bytes each app run
+sends to the browser. Summaries are shown in the app's admin panel and
+can be served as JSON from a local endpoint (set IPL_METRICS_PORT).
+RssSampler measures the peak resident memory of offline fits and
+pipeline stages without tracing their allocations.
+"""
+import cProfile
+import ctypes
+import gc
+import io
+import json
+import os
+import pstats
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+# Histogram bucket upper edges in milliseconds
+BUCKETS_MS = [0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000]
+
+
+class LatencyRecorder:
+    """Thread-safe rolling latency samples per named stage"""
+
+    def __init__(self, window=1000):
+        self.window = window
+        self.samples = {}
+        self.totals = {}
+        self.lock = threading.Lock()
+
+    def record(self, stage, seconds):
+        with self.lock:
+            if stage not in self.samples:
+                self.samples[stage] = deque(maxlen=self.window)
+                self.totals[stage] = 0
+            self.samples[stage].append(seconds * 1000)
+            self.totals[stage] += 1
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def summary(self):
+        """Per-stage count, mean, percentiles and histogram of the rolling window"""
+        with self.lock:
+            snapshot = {stage: np.array(values) for stage, values in self.samples.items()}
+            totals = dict(self.totals)
+
+        summary = {}
+        for stage, values in snapshot.items():
+            counts = np.bincount(np.searchsorted(BUCKETS_MS, values), minlength=len(BUCKETS_MS) + 1)
+            summary[stage] = {
+                'count': totals[stage],
+                'mean_ms': float(values.mean()),
+                'p50_ms': float(np.percentile(values, 50)),
+                'p95_ms': float(np.percentile(values, 95)),
+                'p99_ms': float(np.percentile(values, 99)),
+                'histogram': dict(zip([f'<={b}' for b in BUCKETS_MS] + [f'>{BUCKETS_MS[-1]}'],
+                                      counts.tolist()))
+            }
+        return summary
+
+
+class PayloadMeter:
+    """Bytes of markup and figure JSON emitted per script run, per scope
+
+    Runs are tracked per thread (Streamlit runs each session's script in
+    its own thread); nested scopes, such as a fragment inside a full
+    rerun, count towards every open scope.
+    """
+
+    def __init__(self, window=1000):
+        self.window = window
+        self.samples = {}
+        self.lock = threading.Lock()
+        self.local = threading.local()
+
+    def add(self, nbytes):
+        for entry in getattr(self.local, 'open', []):
+            entry[1] += nbytes
+
+    @contextmanager
+    def run(self, scope):
+        if not hasattr(self.local, 'open'):
+            self.local.open = []
+        entry = [scope, 0]
+        self.local.open.append(entry)
+        try:
+            yield
+        finally:
+            self.local.open.remove(entry)
+            with self.lock:
+                if scope not in self.samples:
+                    self.samples[scope] = deque(maxlen=self.window)
+                self.samples[scope].append(entry[1])
+
+    def summary(self):
+        """Per-scope run count and payload size of the rolling window in KB"""
+        with self.lock:
+            snapshot = {scope: np.array(values) / 1024 for scope, values in self.samples.items()}
+        return {
+            scope: {
+                'runs': len(values),
+                'mean_kb': float(values.mean()),
+                'p95_kb': float(np.percentile(values, 95)),
+                'last_kb': float(values[-1]),
+            }
+            for scope, values in snapshot.items()
+        }
+
+
+try:
+    # glibc keeps freed heap pages for reuse; malloc_trim hands them back to the OS
+    _malloc_trim = ctypes.CDLL('libc.so.6').malloc_trim
+except (OSError, AttributeError):
+    _malloc_trim = None
+
+
+def current_rss_mb():
+    """Resident memory of this process in MB, None where /proc is unavailable"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1e6
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+class RssSampler:
+    """Peak resident memory growth while a block runs, polled from a daemon thread
+
+    Unlike tracemalloc this leaves the block running at full speed and also
+    sees native allocations (numpy buffers, sklearn's trees). Freed memory is
+    released before the baseline is read, so memory freed by an earlier block
+    and reused by this one still counts. Spikes shorter than the polling
+    interval can be missed. peak_mb is None where RSS can't be read.
+    """
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.peak_mb = None
+
+    def __enter__(self):
+        gc.collect()
+        if _malloc_trim is not None:
+            _malloc_trim(0)
+        self.baseline = current_rss_mb()
+        self.peak = self.baseline
+        self.stop = threading.Event()
+        self.thread = None
+        if self.baseline is not None:
+            self.thread = threading.Thread(target=self._poll, daemon=True)
+            self.thread.start()
+        return self
+
+    def _poll(self):
+        while not self.stop.wait(self.interval):
+            self.peak = max(self.peak, current_rss_mb())
+
+    def __exit__(self, *exc):
+        self.stop.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.peak = max(self.peak, current_rss_mb())
+            self.peak_mb = self.peak - self.baseline
+        return False
+
+
+def serve_metrics(recorder, port, host='127.0.0.1'):
+    """Serve recorder.summary() as JSON on http://host:port/metrics in a daemon thread"""
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.rstrip('/') != '/metrics':
+                self.send_error(404)
+                return
+            body = json.dumps(recorder.summary()).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def profile_call(fn, *args, **kwargs):
+    """Run fn once under a profiler and return (result, text report)
+
+    Uses pyinstrument when installed, otherwise cProfile.
+    """
+    try:
+        from pyinstrument import Profiler
+    except ImportError:
+        profiler = cProfile.Profile()
+        result = profiler.runcall(fn, *args, **kwargs)
+        stream = io.StringIO()
+        pstats.Stats(profiler, stream=stream).sort_stats('cumulative').print_stats(30)
+        return result, stream.getvalue()
+
+    profiler = Profiler()
+    profiler.start()
+    try:
+        result = fn(*args, **kwargs)
+    finally:
+        profiler.stop()
+    return result, profiler.output_text(unicode=True)
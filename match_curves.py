@@ -0,0 +1,135 @@
+"""Precomputed ball-by-ball win probability curves for historical matches
+
+Every second innings ball of every match in matches.csv is scored once
+and stored as flat, match-indexed arrays: sorted match ids, offsets into
+the per-ball arrays, and float16 win probabilities (plus the score and
+wickets after each ball for display). The directory is memory-mapped at
+read time, so looking up a curve is a binary search and a slice with no
+feature building or model call.
+
+Usage:
+    python match_curves.py --deliveries deliveries.csv --model advanced_pipe.pkl
+"""
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from features import create_chase_features
+from score_matches import load_pipeline, score_chase
+from venues import canonicalize_venues
+
+ARRAYS = ['match_id', 'offsets', 'win_prob', 'score', 'wickets']
+DTYPES = {
+    'match_id': np.int64,
+    'offsets': np.int64,
+    'win_prob': np.float16,
+    'score': np.int16,
+    'wickets': np.int8,
+}
+
+
+class MatchCurves:
+    """Match-indexed win probability curves, looked up without the model"""
+
+    def __init__(self, arrays, meta=None):
+        for name in ARRAYS:
+            setattr(self, name, arrays[name])
+        self.meta = meta or {}
+
+    def __len__(self):
+        return len(self.match_id)
+
+    def __contains__(self, match_id):
+        return self._position(match_id) is not None
+
+    def _position(self, match_id):
+        i = int(np.searchsorted(self.match_id, match_id))
+        if i < len(self.match_id) and self.match_id[i] == match_id:
+            return i
+        return None
+
+    def curve(self, match_id):
+        """DataFrame of ball, score, wickets and win_prob for one match"""
+        i = self._position(match_id)
+        if i is None:
+            raise KeyError(f"No curve for match {match_id}")
+        rows = slice(self.offsets[i], self.offsets[i + 1])
+        return pd.DataFrame({
+            'ball': np.arange(1, rows.stop - rows.start + 1),
+            'score': self.score[rows],
+            'wickets': self.wickets[rows],
+            'win_prob': self.win_prob[rows].astype(np.float32),
+        })
+
+
+def build_curves(matches, deliveries, top_batsmen_df, model, batch_size=100000):
+    """Score every second innings ball and pack the results by match"""
+    second_innings = create_chase_features(matches, deliveries, top_batsmen_df)
+    # Stable sort keeps the ball order inside each match
+    second_innings = second_innings.sort_values('match_id', kind='stable').reset_index(drop=True)
+
+    win_prob = np.concatenate([
+        score_chase(model, second_innings.iloc[start:start + batch_size])
+        for start in range(0, len(second_innings), batch_size)
+    ]) if len(second_innings) else np.zeros(0)
+
+    match_id, starts = np.unique(second_innings['match_id'].to_numpy(), return_index=True)
+    arrays = {
+        'match_id': match_id,
+        'offsets': np.append(starts, len(second_innings)),
+        'win_prob': win_prob,
+        'score': second_innings['current_score'].to_numpy(),
+        'wickets': second_innings['wickets'].to_numpy(),
+    }
+    arrays = {name: np.ascontiguousarray(arrays[name], dtype=DTYPES[name]) for name in ARRAYS}
+    return MatchCurves(arrays)
+
+
+def save_curves(curves, path, meta=None):
+    """Write curves as raw .npy arrays plus a small metadata file"""
+    os.makedirs(path, exist_ok=True)
+    for name in ARRAYS:
+        np.save(os.path.join(path, f'{name}.npy'), getattr(curves, name))
+    with open(os.path.join(path, 'meta.json'), 'w') as f:
+        json.dump({'matches': len(curves), 'balls': len(curves.win_prob), **(meta or {})}, f, indent=2)
+
+
+def load_curves(path, mmap_mode='r'):
+    """Load curves with memory-mapped arrays"""
+    with open(os.path.join(path, 'meta.json')) as f:
+        meta = json.load(f)
+    arrays = {name: np.load(os.path.join(path, f'{name}.npy'), mmap_mode=mmap_mode) for name in ARRAYS}
+    return MatchCurves(arrays, meta)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute win probability curves for historical matches")
+    parser.add_argument('--matches', default='matches.csv')
+    parser.add_argument('--deliveries', default='deliveries.csv')
+    parser.add_argument('--batting', default='final_batting_2023.csv')
+    parser.add_argument('--model', default='advanced_pipe.pkl',
+                        help="Pickled pipeline or compact model directory")
+    parser.add_argument('--output', default='match_curves')
+    args = parser.parse_args()
+
+    # Venues are canonicalized as in training; old team names fall into the encoders' unknown bucket
+    matches = pd.read_csv(args.matches)
+    matches['venue'] = canonicalize_venues(matches['venue'])
+
+    start = time.perf_counter()
+    curves = build_curves(matches, pd.read_csv(args.deliveries), pd.read_csv(args.batting),
+                          load_pipeline(args.model))
+    elapsed = time.perf_counter() - start
+    save_curves(curves, args.output, {'model': args.model})
+
+    size = sum(os.path.getsize(os.path.join(args.output, f'{name}.npy')) for name in ARRAYS)
+    print(f"✅ Saved curves for {len(curves):,} matches ({len(curves.win_prob):,} balls) to "
+          f"'{args.output}' in {elapsed:.1f}s, {size / 1e6:.2f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""Training/serving feature parity check
+
+Replays every real second-innings ball through the training feature path
+(grouped cumulative sums over deliveries) and through both serving paths,
+the bulk scorer's build_model_input and the app's calculate_advanced_metrics
++ create_input_dataframe, then diffs every model feature.
+The app's formulas before features.py was shared are kept here as
+legacy_serving_metrics so the report shows what serving used to get wrong.
+
+Usage:
+    python parity.py --deliveries deliveries.csv
+"""
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from app_inputs import calculate_advanced_metrics, create_input_dataframe
+from features import MODEL_FEATURES, balls_to_overs, build_model_input, create_chase_features, normalize_teams
+from venues import canonicalize_venues
+
+STATE_COLUMNS = ['batting_team', 'bowling_team', 'venue', 'target', 'current_score',
+                 'wickets', 'total_balls', 'dot_balls', 'last_ball_runs', 'top_batsman_playing']
+
+
+def training_rows(matches, deliveries, top_batsmen_df):
+    """Second innings rows exactly as the training script keeps them"""
+    second_innings = create_chase_features(matches, deliveries, top_batsmen_df)
+    columns = list(dict.fromkeys(MODEL_FEATURES + STATE_COLUMNS + ['balls']))
+    data = second_innings[columns].dropna(subset=MODEL_FEATURES)
+    return data[(data['balls_left'] > 0) & (data['runs_left'] > 0)].reset_index(drop=True)
+
+
+def serving_states(rows):
+    """Match states as the app receives them (overs in cricket notation)"""
+    states = rows[STATE_COLUMNS].copy()
+    states['overs_completed'] = balls_to_overs(rows['balls'].to_numpy())
+    return states
+
+
+def app_serving_input(states):
+    """Model input the app builds for each state, one row at a time as it serves"""
+    frames = []
+    for state in states.to_dict('records'):
+        params = {key: state[key] for key in ['target', 'current_score', 'wickets', 'overs_completed',
+                                              'total_balls', 'dot_balls', 'last_ball_runs',
+                                              'top_batsman_playing']}
+        metrics = calculate_advanced_metrics(params)
+        frames.append(create_input_dataframe(state['batting_team'], state['bowling_team'],
+                                             state['venue'], metrics))
+    return pd.concat(frames, ignore_index=True).set_index(states.index)
+
+
+def legacy_serving_metrics(states):
+    """The app's metric formulas before training and serving shared features.py"""
+    overs = states['overs_completed'].to_numpy(dtype=float)
+    current_score = states['current_score'].to_numpy(dtype=float)
+    wickets = states['wickets'].to_numpy(dtype=float)
+    balls_left = np.maximum(120 - overs * 6, 0)
+    runs_left = np.maximum(states['target'].to_numpy(dtype=float) - current_score, 0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        crr = np.where(overs > 0, current_score / overs, 0)
+        rrr = np.where(balls_left > 0, runs_left * 6 / balls_left, 0)
+        pressure_index = np.where(crr > 0, rrr / crr, 0)
+    wickets_in_hand = 10 - wickets
+
+    legacy = states[['batting_team', 'bowling_team', 'venue']].copy()
+    legacy['current_score'] = current_score
+    legacy['wickets'] = wickets
+    legacy['balls_left'] = balls_left
+    legacy['runs_left'] = runs_left
+    legacy['crr'] = crr
+    legacy['rrr'] = rrr
+    legacy['pressure_index'] = pressure_index
+    legacy['momentum_shift_index'] = (current_score - crr * overs) * (1 + wickets_in_hand / 10)
+    legacy['dot_ball_percent'] = np.minimum(0.6, wickets * 0.1)
+    legacy['wickets_in_hand'] = wickets_in_hand
+    legacy['top_batsman_playing'] = states['top_batsman_playing'].to_numpy()
+    return legacy[MODEL_FEATURES]
+
+
+def diff_features(expected, actual, rtol=1e-6, atol=1e-9):
+    """Per-feature mismatch rate and largest absolute difference"""
+    report = {}
+    for col in MODEL_FEATURES:
+        a, b = expected[col].to_numpy(), actual[col].to_numpy()
+        if a.dtype.kind in 'biuf' and b.dtype.kind in 'biuf':
+            a, b = a.astype(float), b.astype(float)
+            mismatch = ~np.isclose(a, b, rtol=rtol, atol=atol, equal_nan=True)
+            max_diff = float(np.nanmax(np.abs(a - b))) if len(a) else 0.0
+        else:
+            mismatch = a != b
+            max_diff = np.nan
+        report[col] = {'mismatch_rate': mismatch.mean(), 'max_abs_diff': max_diff}
+    return pd.DataFrame(report).T
+
+
+def check_parity(matches, deliveries, top_batsmen_df):
+    """Diff serving features (shared and legacy) against training features"""
+    rows = training_rows(matches, deliveries, top_batsmen_df)
+    states = serving_states(rows)
+    expected = rows[MODEL_FEATURES]
+    shared = diff_features(expected, build_model_input(states))
+    app = diff_features(expected, app_serving_input(states))
+    legacy = diff_features(expected, legacy_serving_metrics(states))
+    report = pd.concat({'serving': shared, 'app': app, 'legacy_serving': legacy}, axis=1)
+    return report, len(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check training/serving feature parity")
+    parser.add_argument('--matches', default='matches.csv')
+    parser.add_argument('--deliveries', default='deliveries.csv')
+    parser.add_argument('--batting', default='final_batting_2023.csv')
+    args = parser.parse_args()
+
+    # Teams are normalized and venues canonicalized as in the training script
+    matches, deliveries = pd.read_csv(args.matches), pd.read_csv(args.deliveries)
+    normalize_teams(matches, deliveries)
+    matches['venue'] = canonicalize_venues(matches['venue'])
+
+    report, n_rows = check_parity(matches, deliveries, pd.read_csv(args.batting))
+    print(f"Replayed {n_rows:,} second innings states\n")
+    with pd.option_context('display.float_format', '{:.4f}'.format, 'display.width', 160,
+                           'display.max_columns', None):
+        print(report)
+
+    for path in ['serving', 'app']:
+        mismatched = report[(path, 'mismatch_rate')] > 0
+        if mismatched.any():
+            print(f"\n❌ {path.capitalize()} features differ from training: {', '.join(report.index[mismatched])}")
+        else:
+            print(f"\n✅ {path.capitalize()} features match training")
+
+
+if __name__ == "__main__":
+    main()
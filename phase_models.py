@@ -0,0 +1,123 @@
+import pickle
+import time
+
+import numpy as np
+from sklearn.pipeline import Pipeline
+from sklearn.compose import ColumnTransformer
+from sklearn.preprocessing import OneHotEncoder
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.metrics import accuracy_score
+
+from features import TOTAL_BALLS
+
+# Innings phases by ball number (1-based, inclusive)
+PHASES = [
+    ('powerplay', 1, 36),
+    ('middle', 37, 90),
+    ('death', 91, 120),
+]
+
+CATEGORICAL_FEATURES = ['batting_team', 'bowling_team', 'venue']
+
+
+def build_phase_pipeline(n_estimators=80, max_depth=8):
+    """Build a smaller forest pipeline for a single phase"""
+    preprocessor = ColumnTransformer([
+        ('cat', OneHotEncoder(handle_unknown='ignore'), CATEGORICAL_FEATURES)
+    ], remainder='passthrough')
+
+    return Pipeline([
+        ('preprocessor', preprocessor),
+        ('model', RandomForestClassifier(
+            n_estimators=n_estimators,
+            max_depth=max_depth,
+            min_samples_split=5,
+            min_samples_leaf=2,
+            random_state=42,
+            class_weight='balanced',
+            n_jobs=-1
+        ))
+    ])
+
+
+class PhaseRouter:
+    """Per-phase sub-models with a router on balls_left
+
+    Exposes predict/predict_proba like a fitted Pipeline so it can be
+    saved as advanced_pipe.pkl and used by app.py unchanged. A total_balls
+    column, when present, gives the allotted balls of reduced-overs
+    chases; it is used for routing only, never as a model feature.
+    """
+
+    def __init__(self, n_estimators=80, max_depth=8):
+        self.n_estimators = n_estimators
+        self.max_depth = max_depth
+        self.phase_names = [name for name, _, _ in PHASES]
+        # Last ball of every phase except the final one
+        self.boundaries = np.array([end for _, _, end in PHASES[:-1]])
+
+    def route(self, X):
+        """Return the phase index of every row as an int array"""
+        total_balls = X['total_balls'] if 'total_balls' in X else TOTAL_BALLS
+        balls = np.asarray(total_balls) - np.asarray(X['balls_left'])
+        return np.searchsorted(self.boundaries, balls, side='left')
+
+    def fit(self, X, y):
+        y = np.asarray(y)
+        phase = self.route(X)
+        self.features_ = [col for col in X.columns if col != 'total_balls']
+        X = X[self.features_]
+        self.models_ = {}
+        for i, name in enumerate(self.phase_names):
+            mask = phase == i
+            if not mask.any():
+                raise ValueError(f"No training rows for the '{name}' phase")
+            pipe = build_phase_pipeline(self.n_estimators, self.max_depth)
+            pipe.fit(X.loc[mask], y[mask])
+            self.models_[name] = pipe
+        self.classes_ = self.models_[self.phase_names[0]].classes_
+        return self
+
+    def predict_proba(self, X):
+        phase = self.route(X)
+        X = X[self.features_]
+        proba = np.zeros((len(X), len(self.classes_)))
+        for i, name in enumerate(self.phase_names):
+            mask = phase == i
+            if mask.any():
+                proba[mask] = self.models_[name].predict_proba(X.loc[mask])
+        return proba
+
+    def predict(self, X):
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
+
+
+def single_row_latency(model, X, repeats=200):
+    """Median predict_proba latency in milliseconds for one row"""
+    row = X.iloc[[0]]
+    model.predict_proba(row)  # warm-up
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        model.predict_proba(row)
+        timings.append(time.perf_counter() - start)
+    return float(np.median(timings)) * 1000
+
+
+def compare_models(models, X_test, y_test):
+    """Compare size, single-row latency and accuracy of fitted models"""
+    report = {}
+    for name, model in models.items():
+        report[name] = {
+            'size_mb': len(pickle.dumps(model)) / 1e6,
+            'latency_ms': single_row_latency(model, X_test),
+            'accuracy': accuracy_score(y_test, model.predict(X_test))
+        }
+    return report
+
+
+def print_report(report):
+    """Print a comparison report as a small table"""
+    print(f"{'Model':<12}{'Size (MB)':>12}{'Latency (ms)':>15}{'Accuracy':>10}")
+    for name, row in report.items():
+        print(f"{name:<12}{row['size_mb']:>12.2f}{row['latency_ms']:>15.2f}{row['accuracy']:>10.3f}")
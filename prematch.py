@@ -0,0 +1,151 @@
+"""Pre-match prior for the chase and its blend into in-play probabilities
+
+Before a ball is bowled the in-play model only sees teams and venue
+through its one-hot columns. The prior adds what matches.csv records
+about the fixture: the chasing team's head-to-head record against the
+team batting first, how often chases succeed at the venue, and whether
+the chasing side won the toss. A logistic regression over those three
+smoothed rates is evaluated once for every (batting first, chasing,
+venue, toss) combination into a lookup table, so scoring a batch is a
+single fancy-indexing operation.
+
+The blend pulls the in-play probability towards the prior with a weight
+w0 * exp(-balls_bowled / scale); w0 and scale are fitted on held-out
+chases, so the prior fades as the chase itself becomes informative.
+Balls bowled count from the allotted balls (the total_balls column of
+model input frames), so reduced-overs chases decay from their first ball.
+"""
+import numpy as np
+import pandas as pd
+from sklearn.linear_model import LogisticRegression
+
+from features import TOTAL_BALLS, match_schedule
+from venues import VENUES
+
+
+def _logit(p):
+    p = np.clip(p, 1e-6, 1 - 1e-6)
+    return np.log(p / (1 - p))
+
+
+def _codes(values, categories):
+    """Category codes of scalars or arrays, -1 for anything unknown"""
+    return pd.Categorical(np.atleast_1d(np.asarray(values, dtype=object)), categories=categories).codes
+
+
+def _total_balls(X):
+    """Allotted balls of every row, 120 where the frame has no total_balls column"""
+    return X['total_balls'] if 'total_balls' in X else TOTAL_BALLS
+
+
+def chaser_won_toss(matches, states):
+    """Whether the batting (chasing) side of each state won the toss, looked up by match_id"""
+    toss_winner = matches.set_index('id')['toss_winner']
+    return (states['match_id'].map(toss_winner) == states['batting_team']).to_numpy()
+
+
+class PreMatchPrior:
+    """Pre-match chase win probability from head-to-head, venue and toss records"""
+
+    def __init__(self, smoothing=10.0):
+        # Pseudo-matches pulling sparse records towards the overall rate
+        self.smoothing = smoothing
+
+    def _h2h_rate(self, wins, games):
+        return (wins + self.smoothing * 0.5) / (games + self.smoothing)
+
+    def _venue_rate(self, wins, games):
+        return (wins + self.smoothing * self.base_rate_) / (games + self.smoothing)
+
+    def fit(self, matches):
+        """Fit on matches.csv rows (canonical venues); no-result matches are skipped"""
+        schedule = match_schedule(matches)
+        schedule['venue'] = matches['venue'].to_numpy()
+        schedule['toss'] = (matches['toss_winner'].to_numpy() == schedule['chasing']).astype(int)
+        schedule = schedule.dropna(subset=['bat_first', 'chasing', 'winner', 'venue'])
+        schedule = schedule[(schedule['winner'] == schedule['bat_first']) |
+                            (schedule['winner'] == schedule['chasing'])]
+
+        self.teams_ = sorted(set(schedule['bat_first']) | set(schedule['chasing']))
+        # Code -1 (unknown team or venue) indexes the extra last slot of every table
+        bat_first = pd.Categorical(schedule['bat_first'], categories=self.teams_).codes
+        chasing = pd.Categorical(schedule['chasing'], categories=self.teams_).codes
+        venue = pd.Categorical(schedule['venue'], categories=VENUES).codes
+        won = (schedule['winner'] == schedule['chasing']).to_numpy(dtype=float)
+        toss = schedule['toss'].to_numpy()
+
+        n_teams, n_venues = len(self.teams_) + 1, len(VENUES) + 1
+        wins = np.zeros((n_teams, n_teams))  # wins[a, b]: times a beat b
+        np.add.at(wins, (chasing, bat_first), won)
+        np.add.at(wins, (bat_first, chasing), 1 - won)
+        games = np.zeros((n_teams, n_teams))
+        np.add.at(games, (chasing, bat_first), 1)
+        np.add.at(games, (bat_first, chasing), 1)
+        venue_wins = np.bincount(venue % n_venues, weights=won, minlength=n_venues)
+        venue_games = np.bincount(venue % n_venues, minlength=n_venues).astype(float)
+        self.base_rate_ = float(won.mean())
+
+        # Leave-one-out rates so no match informs its own prior
+        h2h = self._h2h_rate(wins[chasing, bat_first] - won, games[chasing, bat_first] - 1)
+        venue_rate = self._venue_rate(venue_wins[venue] - won, venue_games[venue] - 1)
+        X = np.column_stack([_logit(h2h), _logit(venue_rate) - _logit(self.base_rate_), toss])
+        model = LogisticRegression().fit(X, won)
+        self.coef_ = model.coef_[0]
+        self.intercept_ = float(model.intercept_[0])
+
+        # table_[batting first, chasing, venue, chaser won toss]
+        h2h_table = _logit(self._h2h_rate(wins.T, games))
+        venue_table = _logit(self._venue_rate(venue_wins, venue_games)) - _logit(self.base_rate_)
+        logits = (self.intercept_
+                  + self.coef_[0] * h2h_table[:, :, None, None]
+                  + self.coef_[1] * venue_table[None, None, :, None]
+                  + self.coef_[2] * np.arange(2)[None, None, None, :])
+        self.table_ = (1 / (1 + np.exp(-logits))).astype(np.float32)
+
+        # No blending until fit_blend has seen held-out chases
+        self.blend_weight_ = 0.0
+        self.blend_scale_ = 1.0
+        return self
+
+    def predict(self, batting_team, bowling_team, venue, chaser_won_toss):
+        """Pre-match chance that the chasing (batting) team wins, one table lookup per row"""
+        chasing = _codes(batting_team, self.teams_)
+        bat_first = _codes(bowling_team, self.teams_)
+        venue = _codes(venue, VENUES)
+        toss = np.atleast_1d(np.asarray(chaser_won_toss, dtype=int))
+        return self.table_[bat_first, chasing, venue, toss].astype(float)
+
+    def weight(self, balls_left, total_balls=TOTAL_BALLS):
+        """Blend weight of the prior, decaying with balls bowled"""
+        balls_bowled = np.asarray(total_balls, dtype=float) - np.asarray(balls_left, dtype=float)
+        return self.blend_weight_ * np.exp(-balls_bowled / self.blend_scale_)
+
+    def blend_terms(self, X, chaser_won_toss):
+        """(weight, prior) for every row of chase model input X"""
+        prior = self.predict(X['batting_team'], X['bowling_team'], X['venue'], chaser_won_toss)
+        return self.weight(X['balls_left'], _total_balls(X)), prior
+
+    def blend(self, inplay, X, chaser_won_toss):
+        """In-play probabilities pulled towards the prior"""
+        weight, prior = self.blend_terms(X, chaser_won_toss)
+        return inplay + weight * (prior - inplay)
+
+    def fit_blend(self, inplay, X, chaser_won_toss, y, weights=np.linspace(0, 1, 21),
+                  scales=(6, 12, 24, 36, 60, 120)):
+        """Pick the starting weight and decay scale minimizing held-out log-loss"""
+        inplay = np.asarray(inplay, dtype=float)
+        y = np.asarray(y, dtype=float)
+        prior = self.predict(X['batting_team'], X['bowling_team'], X['venue'], chaser_won_toss)
+        balls_bowled = np.asarray(_total_balls(X), dtype=float) - np.asarray(X['balls_left'], dtype=float)
+
+        best = (np.inf, 0.0, 1.0)
+        for scale in scales:
+            weight = weights[:, None] * np.exp(-balls_bowled / scale)[None, :]
+            p = np.clip(inplay + weight * (prior - inplay), 1e-6, 1 - 1e-6)
+            loss = -(y * np.log(p) + (1 - y) * np.log(1 - p)).mean(axis=1)
+            i = int(np.argmin(loss))
+            if loss[i] < best[0]:
+                best = (loss[i], float(weights[i]), float(scale))
+
+        _, self.blend_weight_, self.blend_scale_ = best
+        return self
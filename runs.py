@@ -0,0 +1,243 @@
+"""Reproducible training runs with cached stages and a run manifest
+
+Each stage of a training run (loading data, building features, fitting
+the encoder, fitting the model) is keyed by a content hash of what
+determines its output: the source of the module defining the stage
+function and of every local module it imports, its parameters, the bytes
+of any input files it depends on, and the keys of the upstream stages it
+consumes. Outputs are cached under that key, so a
+rerun with unchanged inputs loads them instead of recomputing, and any
+change invalidates exactly the stages downstream of it.
+
+Every run writes runs/<run_id>.json with per-stage wall time, peak
+resident memory growth (sampled, so stages run at full speed), process
+peak RSS so far and cache hits, metrics, data and artifact hashes, and
+the git commit and library versions. Tracing the Python heap with
+tracemalloc (trace_python_heap=True) adds a per-stage Python heap peak
+but slows stages severalfold, so their wall times are then not
+comparable with untraced runs.
+
+Usage:
+    python runs.py    # compare recorded runs
+"""
+import ast
+import hashlib
+import inspect
+import json
+import os
+import platform
+import subprocess
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+import joblib
+import pandas as pd
+
+from instrumentation import RssSampler
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def file_hash(path, chunk_size=1 << 20):
+    """sha256 of a file's bytes"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(chunk_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _imports(path):
+    """Top-level names of the modules a source file imports"""
+    with open(path, 'rb') as f:
+        tree = ast.parse(f.read(), filename=path)
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            yield from (alias.name.split('.')[0] for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.level == 0 and node.module:
+            yield node.module.split('.')[0]
+
+
+def local_modules(fn):
+    """Source files of the module defining fn and of the local modules it imports, recursively
+
+    Local means a .py file next to the defining module; library code is
+    left to the versions recorded in the manifest.
+    """
+    path = getattr(inspect.getmodule(fn), '__file__', None)
+    if path is None:
+        return []
+    root = os.path.dirname(os.path.realpath(path))
+    paths, pending = set(), [os.path.realpath(path)]
+    while pending:
+        path = pending.pop()
+        if path in paths:
+            continue
+        paths.add(path)
+        candidates = (os.path.join(root, f'{name}.py') for name in _imports(path))
+        pending.extend(candidate for candidate in candidates if os.path.exists(candidate))
+    return sorted(paths)
+
+
+def _peak_rss_mb():
+    """Peak resident memory of this process so far (ru_maxrss is in KB on Linux)"""
+    if resource is None:
+        return None
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+@contextmanager
+def _traced(enabled):
+    """Yield a dict that gets the block's Python heap 'peak' (tracemalloc), or None when disabled"""
+    if not enabled:
+        yield None
+        return
+    heap = {}
+    tracemalloc.start()
+    try:
+        yield heap
+    finally:
+        heap['peak'] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _versions():
+    versions = {'python': platform.python_version()}
+    for name in ['numpy', 'pandas', 'sklearn', 'joblib']:
+        try:
+            versions[name] = __import__(name).__version__
+        except ImportError:
+            pass
+    return versions
+
+
+class RunManager:
+    """Runs training stages through a content-addressed cache and records a manifest"""
+
+    def __init__(self, cache_dir='.run_cache', runs_dir='runs', use_cache=True, trace_python_heap=False):
+        self.cache_dir = cache_dir
+        self.runs_dir = runs_dir
+        self.use_cache = use_cache
+        self.trace_python_heap = trace_python_heap
+        self.run_id = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+        self.keys = {}
+        self.stages = []
+        self.metrics = {}
+        self.files = {}
+        self.artifacts = {}
+        self.start = time.perf_counter()
+
+    def _file_hash(self, path):
+        if path not in self.files:
+            self.files[path] = file_hash(path)
+        return self.files[path]
+
+    def stage_key(self, name, fn, after=(), params=None, files=()):
+        """Content hash identifying a stage's output"""
+        digest = hashlib.sha256()
+        digest.update(name.encode())
+        digest.update(getattr(fn, '__qualname__', repr(fn)).encode())
+        digest.update(joblib.hash(params).encode())
+        for path in local_modules(fn):
+            digest.update(f'{os.path.basename(path)}:{self._file_hash(path)}'.encode())
+        for path in files:
+            digest.update(f'{path}:{self._file_hash(path)}'.encode())
+        for upstream in after:
+            digest.update(f'{upstream}:{self.keys[upstream]}'.encode())
+        return digest.hexdigest()[:16]
+
+    def stage(self, name, fn, *args, after=(), params=None, files=(), **kwargs):
+        """Return fn(*args, **kwargs), loading it from the cache when the stage is unchanged
+
+        args and kwargs must be determined by after (upstream stage names),
+        params and files; they are not hashed themselves.
+        """
+        key = self.stage_key(name, fn, after, params, files)
+        self.keys[name] = key
+        path = os.path.join(self.cache_dir, f'{name}-{key}.pkl')
+        cached = self.use_cache and os.path.exists(path)
+
+        with RssSampler() as rss, _traced(self.trace_python_heap) as heap:
+            start = time.perf_counter()
+            result = joblib.load(path) if cached else fn(*args, **kwargs)
+            elapsed = time.perf_counter() - start
+
+        if not cached and self.use_cache:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            joblib.dump(result, path)
+
+        record = {'name': name, 'key': key, 'cached': cached, 'wall_s': round(elapsed, 3),
+                  'rss_growth_mb': None if rss.peak_mb is None else round(rss.peak_mb, 1),
+                  'peak_rss_mb': _peak_rss_mb()}
+        if heap is not None:
+            record['py_heap_peak_mb'] = round(heap['peak'] / 1e6, 1)
+        self.stages.append(record)
+        memory = '' if rss.peak_mb is None else f", peak RSS +{rss.peak_mb:.0f} MB"
+        print(f"[{name}] {'cached' if cached else 'ran'} in {elapsed:.1f}s{memory}")
+        return result
+
+    def log_metrics(self, prefix, metrics):
+        self.metrics.update({f'{prefix}.{k}': float(v) for k, v in metrics.items()})
+
+    def log_artifact(self, path):
+        self.artifacts[path] = {'sha256': file_hash(path), 'size_mb': round(os.path.getsize(path) / 1e6, 3)}
+
+    def write_manifest(self):
+        """Write runs/<run_id>.json and return its path"""
+        manifest = {
+            'run_id': self.run_id,
+            'git_commit': _git_commit(),
+            'versions': _versions(),
+            'total_s': round(time.perf_counter() - self.start, 3),
+            'files': self.files,
+            'stages': self.stages,
+            'metrics': self.metrics,
+            'artifacts': self.artifacts,
+        }
+        os.makedirs(self.runs_dir, exist_ok=True)
+        path = os.path.join(self.runs_dir, f'{self.run_id}.json')
+        with open(path, 'w') as f:
+            json.dump(manifest, f, indent=2)
+        return path
+
+
+def load_runs(runs_dir='runs'):
+    """One row per recorded run: total time, per-stage wall time and metrics"""
+    rows = []
+    for name in sorted(os.listdir(runs_dir)) if os.path.isdir(runs_dir) else []:
+        if not name.endswith('.json'):
+            continue
+        with open(os.path.join(runs_dir, name)) as f:
+            manifest = json.load(f)
+        row = {'run_id': manifest['run_id'], 'commit': (manifest['git_commit'] or '')[:8],
+               'total_s': manifest['total_s']}
+        row.update({f"{s['name']}_s": s['wall_s'] for s in manifest['stages']})
+        row.update(manifest['metrics'])
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+
+def main():
+    runs = load_runs()
+    if runs.empty:
+        print("No runs recorded yet, run the training script first")
+        return
+    with pd.option_context('display.float_format', '{:.4f}'.format, 'display.width', 160):
+        print(runs.set_index('run_id').T)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+"""Chase scenario planner: win probability by dynamic programming over the chase state
+
+A chase is a Markov chain over (balls_left, runs_left, wickets_in_hand).
+Every ball has an outcome drawn from per-phase probabilities (powerplay,
+middle, death) over the outcomes defined in features.py: wicket, dot, 1, 2,
+3, 4, 6 and extra. Extras add a run without using up a legal ball.
+Working backwards from the last ball fills the whole value table
+P(win | balls_left, runs_left, wickets_in_hand) one balls_left layer at a
+time. Each layer is a single vectorized update over every (runs_left,
+wickets) cell. Scores level at the end count as half a win (super over).
+Phases follow the ball being bowled, so a reduced-overs chase of
+total_balls is solved on its own table.
+
+Runs convention: the planner's arguments follow the app's, where target
+is the first innings total and runs_left = target - score is the runs
+needed to tie. The value table itself is indexed by runs needed to win
+(runs_left + 1), so that index 0 is the won state; _runs_to_win is the
+only place converting between the two.
+
+From the table, par_runs_left gives the most runs a side can still need
+and keep a 50% chance. A par score line follows from that.
+
+Outcome rates are estimated from real chase deliveries: a global rate
+per phase plus venue and batting team rates, each shrunk towards the
+global rate. Without a rates file the default PHASE_PROBS are used.
+
+Usage:
+    python scenario_planner.py --deliveries deliveries.csv --matches matches.csv
+"""
+import argparse
+import json
+
+import numpy as np
+import pandas as pd
+
+from features import (EXTRA, OUTCOME_RUNS, OUTCOME_WICKET, PHASE_OF_BALL, PHASE_PROBS, TOTAL_BALLS,
+                      classify_deliveries)
+from venues import canonicalize_venues
+
+# Runs left above this are treated as this many (a chase is all but lost well before)
+MAX_RUNS = 300
+# Terms of the geometric series of consecutive extras before a legal ball
+MAX_EXTRAS = 8
+
+
+def fit_outcome_rates(deliveries, matches, smoothing=300):
+    """Per-phase outcome rates of chases: global, per venue and per batting team
+
+    Venue and team counts are shrunk towards the global rate with
+    smoothing pseudo-balls per phase. The result is JSON-serializable.
+    """
+    chase = deliveries[deliveries['inning'] == 2]
+    phase, outcome = classify_deliveries(chase)
+    venue = chase['match_id'].map(matches.set_index('id')['venue']).to_numpy()
+    team = chase['batting_team'].to_numpy()
+
+    def counts(mask):
+        table = np.zeros((len(PHASE_PROBS), len(OUTCOME_RUNS)))
+        np.add.at(table, (phase[mask], outcome[mask]), 1)
+        return table
+
+    total = counts(np.ones(len(chase), dtype=bool))
+    base = total / total.sum(axis=1, keepdims=True)
+
+    def shrunk(mask):
+        table = counts(mask) + smoothing * base
+        return (table / table.sum(axis=1, keepdims=True)).tolist()
+
+    return {
+        'global': base.tolist(),
+        'venues': {name: shrunk(venue == name) for name in pd.unique(venue[pd.notnull(venue)])},
+        'teams': {name: shrunk(team == name) for name in pd.unique(team[pd.notnull(team)])},
+    }
+
+
+def save_rates(rates, path):
+    with open(path, 'w') as f:
+        json.dump(rates, f, indent=2)
+
+
+def load_rates(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def outcome_probs(rates=None, venue=None, batting_team=None):
+    """Per-phase outcome probabilities for a venue and batting team
+
+    Venue and team effects combine multiplicatively on the global rate;
+    unknown venues and teams fall back to it.
+    """
+    if rates is None:
+        return PHASE_PROBS
+    base = np.asarray(rates['global'])
+    log_probs = np.log(base)
+    for table, name in [(rates['venues'], venue), (rates['teams'], batting_team)]:
+        if name in table:
+            log_probs += np.log(table[name]) - np.log(base)
+    probs = np.exp(log_probs)
+    return probs / probs.sum(axis=1, keepdims=True)
+
+
+def solve(phase_probs=PHASE_PROBS, max_runs=MAX_RUNS, total_balls=TOTAL_BALLS):
+    """Win probability table indexed [balls_left, runs to win, wickets_in_hand]"""
+    phase_probs = np.asarray(phase_probs, dtype=float)
+    runs = np.arange(max_runs + 1)
+    legal = np.arange(len(OUTCOME_RUNS)) != EXTRA
+    legal_runs = OUTCOME_RUNS[legal]
+    legal_wicket = OUTCOME_WICKET[legal].astype(bool)
+    # Runs-to-win index after each legal outcome and after k extras, floored at 0 (won)
+    after_ball = np.maximum(runs[None, :] - legal_runs[:, None], 0)
+    extras = np.arange(MAX_EXTRAS + 1)[:, None]
+    after_extras = np.maximum(runs[None, :] - extras, 0)
+
+    value = np.zeros((total_balls + 1, max_runs + 1, 11))
+    value[:, 0, :] = 1
+    # Level scores after the last ball, or all out one short, go to a super over
+    value[0, 1, :] = 0.5
+    value[:, 1, 0] = 0.5
+    for balls_left in range(1, total_balls + 1):
+        # Phase of the ball about to be bowled, counted from the chase's first ball
+        probs = phase_probs[PHASE_OF_BALL[total_balls - balls_left]]
+        p_legal, p_extra = probs[legal], probs[EXTRA]
+
+        # Next state after each legal outcome: [outcome, runs_left, wickets_in_hand 1..10]
+        prev = value[balls_left - 1][after_ball]
+        prev = np.where(legal_wicket[:, None, None], prev[:, :, :-1], prev[:, :, 1:])
+        legal_value = np.tensordot(p_legal, prev, axes=1)
+
+        # Any number of extras can come first: k extras short of the target are followed by a legal
+        # ball (p_extra^k * legal_value[runs - k]); extras reaching it win outright (p_extra^runs)
+        series = np.where(extras < runs, p_extra ** extras, 0.0)
+        reached = np.where(runs <= MAX_EXTRAS, p_extra ** runs, 0.0)
+        chase = np.einsum('kr,krw->rw', series, legal_value[after_extras]) + reached[:, None]
+        value[balls_left, 1:, 1:] = chase[1:]
+    return value
+
+
+class ScenarioPlanner:
+    """Chase win probability and par scores from a dynamic programming value table"""
+
+    def __init__(self, phase_probs=PHASE_PROBS, max_runs=MAX_RUNS, total_balls=TOTAL_BALLS):
+        self.max_runs = max_runs
+        self.table_ = solve(phase_probs, max_runs, total_balls).astype(np.float32)
+        # Most runs left (to tie) that still leaves a chance of at least 50%; the table falls with runs
+        self.par_runs_left_ = (self.table_[:, 1:, :] >= 0.5).sum(axis=1) - 1
+
+    def _balls_left(self, balls_left):
+        return np.clip(np.asarray(balls_left, dtype=int), 0, len(self.table_) - 1)
+
+    def _runs_to_win(self, runs_left):
+        """Table index of runs_left to tie; a side already ahead has won"""
+        return np.clip(np.asarray(runs_left, dtype=int) + 1, 0, self.max_runs)
+
+    def win_probability(self, balls_left, runs_left, wickets_in_hand):
+        """P(win) for scalars or equal-length arrays of chase states"""
+        wickets_in_hand = np.clip(np.asarray(wickets_in_hand, dtype=int), 0, 10)
+        return self.table_[self._balls_left(balls_left), self._runs_to_win(runs_left),
+                           wickets_in_hand].astype(float)
+
+    def par_runs_left(self, balls_left, wickets_in_hand):
+        """Most runs still needed with a win chance of at least 50%"""
+        wickets_in_hand = np.clip(np.asarray(wickets_in_hand, dtype=int), 0, 10)
+        return self.par_runs_left_[self._balls_left(balls_left), wickets_in_hand]
+
+    def par_score(self, target, balls_left, wickets_in_hand):
+        """Score the chasing side needs with balls_left to go to keep a 50% win chance"""
+        return target - self.par_runs_left(balls_left, wickets_in_hand)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Estimate per-ball chase outcome rates for the scenario planner")
+    parser.add_argument('--deliveries', default='deliveries.csv')
+    parser.add_argument('--matches', default='matches.csv')
+    parser.add_argument('--smoothing', type=float, default=300,
+                        help="Pseudo-balls per phase shrinking venue and team rates to the global rate")
+    parser.add_argument('--output', default='outcome_rates.json')
+    args = parser.parse_args()
+
+    matches = pd.read_csv(args.matches)
+    matches['venue'] = canonicalize_venues(matches['venue'])
+    rates = fit_outcome_rates(pd.read_csv(args.deliveries), matches, args.smoothing)
+    save_rates(rates, args.output)
+
+    planner = ScenarioPlanner(outcome_probs(rates))
+    par = planner.par_runs_left(np.arange(TOTAL_BALLS, 0, -30), 10)
+    print(f"✅ Saved outcome rates for {len(rates['venues'])} venues and {len(rates['teams'])} teams "
+          f"to '{args.output}'\nPar runs left with 10 wickets in hand after 0/5/10/15 overs: "
+          f"{', '.join(str(int(p)) for p in par)}")
+
+
+if __name__ == "__main__":
+    main()
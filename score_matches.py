@@ -0,0 +1,177 @@
+"""Bulk offline scoring of chase states
+
+Reads match-state rows from CSV or Parquet in chunks, builds the model
+features, scores chunks across a process pool and appends results to the
+output as they finish, so memory stays flat regardless of input size.
+
+Input columns: batting_team, bowling_team, venue, target, current_score,
+wickets and either balls or overs_completed in cricket notation (optional:
+inning, total_balls for reduced-overs innings, dot_balls, last_ball_runs,
+top_batsman_playing, toss_winner). Rows with
+inning == 1 are scored by the first innings model and need no target.
+With a pre-match prior, chase rows that have toss_winner are blended
+with it.
+All input columns are kept and a win_prob column (for the batting team)
+is added.
+
+Usage:
+    python score_matches.py states.csv scored.csv --workers 4 --chunksize 50000
+"""
+import argparse
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from compact_model import load_compact
+from features import build_first_innings_input, build_model_input
+
+_model = None
+_first_model = None
+_prior = None
+
+
+def load_pipeline(path):
+    """Load a pickled pipeline or a compact model directory"""
+    return load_compact(path) if os.path.isdir(path) else joblib.load(path)
+
+
+def _init_worker(model_path, first_model_path=None, prior_path=None):
+    global _model, _first_model, _prior
+    _model = load_pipeline(model_path)
+    if first_model_path:
+        _first_model = joblib.load(first_model_path)
+    if prior_path:
+        _prior = joblib.load(prior_path)
+
+
+def score_chase(model, states, prior=None):
+    """Chase win probability for a DataFrame of second innings states"""
+    X = build_model_input(states)
+    # target is runs to tie (features.chase_terms): the chase is won once runs_left < 0, and
+    # scores level after the last ball go to a super over. Level scores with balls left are live.
+    runs_left, balls_left = X['runs_left'].to_numpy(), X['balls_left'].to_numpy()
+    win_prob = np.select([runs_left < 0, runs_left == 0], [1.0, 0.5], default=0.0)
+    live = (balls_left > 0) & (runs_left >= 0)
+    if live.any():
+        win_prob[live] = model.predict_proba(X[live])[:, 1]
+        if prior is not None and 'toss_winner' in states.columns:
+            toss = (states['toss_winner'] == states['batting_team']).to_numpy()
+            win_prob[live] = prior.blend(win_prob[live], X[live], toss[live])
+    return win_prob
+
+
+def score_chunk(chunk, model=None, first_model=None, prior=None):
+    """Add a win_prob column to a chunk of match states from either innings"""
+    model = _model if model is None else model
+    first_model = _first_model if first_model is None else first_model
+    prior = _prior if prior is None else prior
+
+    first = np.zeros(len(chunk), dtype=bool)
+    if 'inning' in chunk.columns:
+        first = (chunk['inning'] == 1).to_numpy()
+
+    win_prob = np.zeros(len(chunk))
+    if first.any():
+        if first_model is None:
+            raise ValueError("First innings rows need a first innings model (--first-innings-model)")
+        win_prob[first] = first_model.predict_proba(build_first_innings_input(chunk[first]))[:, 1]
+    if not first.all():
+        win_prob[~first] = score_chase(model, chunk[~first], prior)
+    return chunk.assign(win_prob=win_prob)
+
+
+def read_chunks(path, chunksize):
+    """Yield DataFrame chunks from a CSV or Parquet file"""
+    if path.endswith('.parquet'):
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunksize):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, chunksize=chunksize)
+
+
+class ChunkWriter:
+    """Append scored chunks to a CSV or Parquet file"""
+
+    def __init__(self, path):
+        self.path = path
+        self.parquet_writer = None
+        self.header = True
+
+    def write(self, chunk):
+        if self.path.endswith('.parquet'):
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if self.parquet_writer is None:
+                self.parquet_writer = pq.ParquetWriter(self.path, table.schema)
+            self.parquet_writer.write_table(table)
+        else:
+            chunk.to_csv(self.path, mode='w' if self.header else 'a', header=self.header, index=False)
+        self.header = False
+
+    def close(self):
+        if self.parquet_writer is not None:
+            self.parquet_writer.close()
+
+
+def score_file(input_path, output_path, model_path, workers, chunksize, first_model_path=None,
+               prior_path=None):
+    """Score input_path into output_path, keeping at most 2 chunks per worker in flight"""
+    writer = ChunkWriter(output_path)
+    pending = deque()
+    rows = 0
+    start = time.perf_counter()
+
+    def flush(future):
+        nonlocal rows
+        scored = future.result()
+        writer.write(scored)
+        rows += len(scored)
+        elapsed = time.perf_counter() - start
+        print(f"\r{rows:,} rows, {rows / elapsed:,.0f} rows/sec", end='', file=sys.stderr)
+
+    try:
+        with ProcessPoolExecutor(workers, initializer=_init_worker,
+                                 initargs=(model_path, first_model_path, prior_path)) as pool:
+            for chunk in read_chunks(input_path, chunksize):
+                pending.append(pool.submit(score_chunk, chunk))
+                if len(pending) >= 2 * workers:
+                    flush(pending.popleft())
+            while pending:
+                flush(pending.popleft())
+    finally:
+        writer.close()
+
+    elapsed = time.perf_counter() - start
+    print(f"\n✅ Scored {rows:,} rows in {elapsed:.1f}s ({rows / max(elapsed, 1e-9):,.0f} rows/sec)",
+          file=sys.stderr)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score chase states in bulk")
+    parser.add_argument('input', help="CSV or .parquet file of match states")
+    parser.add_argument('output', help="CSV or .parquet file to write")
+    parser.add_argument('--model', default='advanced_pipe.pkl',
+                        help="Pickled pipeline or compact model directory")
+    parser.add_argument('--first-innings-model', default=None,
+                        help="Pickled FirstInningsModel for rows with inning == 1")
+    parser.add_argument('--prematch-model', default=None,
+                        help="Pickled PreMatchPrior blended into chase rows with a toss_winner column")
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--chunksize', type=int, default=50000)
+    args = parser.parse_args()
+
+    score_file(args.input, args.output, args.model, args.workers, args.chunksize,
+               args.first_innings_model, args.prematch_model)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+"""Serve one copy of the compact forest to many worker processes
+
+A loader process publishes the CompactForest node arrays into a single
+shared memory block (or points workers at the memory-mapped .npy files
+written by compact_model.py). Workers attach zero-copy: their arrays
+are views on the shared pages, so adding workers adds only the small
+preprocessor and per-batch scratch memory.
+
+Usage:
+    python shared_serving.py states.csv --model advanced_pipe_compact --workers 1 4 8
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import resource_tracker, shared_memory
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from compact_model import (ARRAYS, CompactForest, CompactPipeline, compact_pipeline, load_compact,
+                           save_compact)
+from score_matches import score_chase
+
+_model = None
+
+
+class SharedModel:
+    """Owns the shared memory block holding a published CompactForest"""
+
+    def __init__(self, model, preprocessor_path):
+        forest = model.forest
+        arrays = [np.ascontiguousarray(getattr(forest, name)) for name in ARRAYS]
+        self.shm = shared_memory.SharedMemory(create=True, size=sum(a.nbytes for a in arrays))
+
+        layout, offset = [], 0
+        for name, array in zip(ARRAYS, arrays):
+            view = np.ndarray(array.shape, array.dtype, buffer=self.shm.buf, offset=offset)
+            view[...] = array
+            layout.append((name, array.dtype.str, array.shape, offset))
+            offset += array.nbytes
+
+        self.descriptor = {
+            'mode': 'shm',
+            'name': self.shm.name,
+            'layout': layout,
+            'max_depth': forest.max_depth,
+            'classes': forest.classes_.tolist(),
+            'preprocessor': preprocessor_path,
+        }
+
+    def close(self):
+        self.shm.close()
+        self.shm.unlink()
+
+
+def publish_model(path, mode='shm'):
+    """Publish a compact model directory for workers
+
+    Returns (owner, descriptor); keep owner alive while workers run and
+    call owner.close() when done. In 'mmap' mode workers map the .npy
+    files directly and owner is None.
+    """
+    if not os.path.isdir(path):
+        raise ValueError(f"'{path}' is not a compact model directory, run compact_model.py first")
+    if mode == 'mmap':
+        return None, {'mode': 'mmap', 'path': path}
+    owner = SharedModel(load_compact(path), os.path.join(path, 'preprocessor.pkl'))
+    return owner, owner.descriptor
+
+
+def attach_model(descriptor):
+    """Build a CompactPipeline whose arrays are views on the published model"""
+    if descriptor['mode'] == 'mmap':
+        return load_compact(descriptor['path'])
+
+    shm = _attach_shm(descriptor['name'])
+    arrays = {name: np.ndarray(shape, np.dtype(dtype), buffer=shm.buf, offset=offset)
+              for name, dtype, shape, offset in descriptor['layout']}
+    forest = CompactForest(arrays, descriptor['max_depth'], descriptor['classes'])
+    model = CompactPipeline(joblib.load(descriptor['preprocessor']), forest)
+    model._shm = shm
+    return model
+
+
+def _attach_shm(name):
+    """Attach to a published block, leaving its lifecycle to the loader that created it"""
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    # Pool workers share the loader's resource tracker, which already holds the block (a repeat
+    # registration is a no-op) and must keep it until the loader unlinks. Only a process that
+    # starts its own tracker has to drop the block from it, or that tracker unlinks it at exit.
+    own_tracker = resource_tracker._resource_tracker._fd is None
+    shm = shared_memory.SharedMemory(name=name)
+    if own_tracker:
+        resource_tracker.unregister(shm._name, 'shared_memory')
+    return shm
+
+
+def _attach_worker(descriptor):
+    global _model
+    _model = attach_model(descriptor)
+
+
+def _score_batch(states):
+    return score_chase(_model, states)
+
+
+def _worker_pid(_):
+    time.sleep(0.05)
+    return os.getpid()
+
+
+class SharedScorer:
+    """Process pool that fans batches of chase states across cores"""
+
+    def __init__(self, descriptor, workers):
+        self.workers = workers
+        self.pool = ProcessPoolExecutor(workers, initializer=_attach_worker, initargs=(descriptor,))
+        # Start every worker before anything is timed
+        self.pids = set(self.pool.map(_worker_pid, range(workers * 4)))
+
+    def score(self, states, batch_size=5000):
+        """Chase win probability for every row of states, in order"""
+        batches = [states.iloc[i:i + batch_size] for i in range(0, len(states), batch_size)]
+        return np.concatenate(list(self.pool.map(_score_batch, batches)))
+
+    def close(self):
+        self.pool.shutdown()
+
+
+def process_memory(pid):
+    """RSS and PSS of a process in MB (PSS splits shared pages between sharers)"""
+    usage = {'rss': 0.0, 'pss': 0.0}
+    try:
+        with open(f'/proc/{pid}/smaps_rollup') as f:
+            for line in f:
+                parts = line.split()
+                if parts[0] == 'Rss:':
+                    usage['rss'] = int(parts[1]) / 1024
+                elif parts[0] == 'Pss:':
+                    usage['pss'] = int(parts[1]) / 1024
+    except OSError:
+        pass
+    return usage
+
+
+def benchmark(descriptor, states, worker_counts, batch_size):
+    """Throughput and summed worker memory at each pool size"""
+    results = {}
+    for workers in worker_counts:
+        scorer = SharedScorer(descriptor, workers)
+        try:
+            scorer.score(states.iloc[:batch_size], batch_size)  # warm-up
+            start = time.perf_counter()
+            scorer.score(states, batch_size)
+            elapsed = time.perf_counter() - start
+            memory = [process_memory(pid) for pid in scorer.pids]
+        finally:
+            scorer.close()
+        results[workers] = {
+            'rows_per_s': len(states) / elapsed,
+            'rss_mb': sum(m['rss'] for m in memory),
+            'pss_mb': sum(m['pss'] for m in memory),
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark shared-memory model serving")
+    parser.add_argument('states', help="CSV of chase states (see score_matches.py)")
+    parser.add_argument('--model', default='advanced_pipe_compact',
+                        help="Compact model directory, or a pickled pipeline to compact first")
+    parser.add_argument('--mode', choices=['shm', 'mmap'], default='shm')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 4, 8])
+    parser.add_argument('--batch-size', type=int, default=5000)
+    args = parser.parse_args()
+
+    model_path = args.model
+    if not os.path.isdir(model_path):
+        model_path = os.path.splitext(args.model)[0] + '_compact'
+        save_compact(compact_pipeline(joblib.load(args.model)), model_path)
+
+    states = pd.read_csv(args.states)
+    owner, descriptor = publish_model(model_path, args.mode)
+    try:
+        results = benchmark(descriptor, states, args.workers, args.batch_size)
+    finally:
+        if owner is not None:
+            owner.close()
+
+    print(f"{len(states):,} states, mode={args.mode}\n")
+    print(f"{'Workers':>8}{'Rows/s':>12}{'Total RSS (MB)':>16}{'Total PSS (MB)':>16}")
+    for workers, row in results.items():
+        print(f"{workers:>8}{row['rows_per_s']:>12,.0f}{row['rss_mb']:>16.1f}{row['pss_mb']:>16.1f}")
+
+
+if __name__ == "__main__":
+    main()
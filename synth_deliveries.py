@@ -0,0 +1,234 @@
+"""Deterministic synthetic ball-by-ball data for load and scale testing
+
+Generates deliveries.csv-shaped rows for every match in matches.csv (who
+bats first follows the toss), optionally repeated with fresh match ids to
+reach any size. Outcomes are drawn per ball from phase-dependent
+probabilities (powerplay, middle, death) calibrated to IPL ball-by-ball
+rates, or re-estimated from a real deliveries file with --calibrate.
+Every innings gets a random strength, nudged towards the actual winner,
+so labels stay related to the play. Each legal ball is preceded by a
+geometric number of extras, so innings get their full 120 legal balls.
+Innings stop at ten wickets; chases stop once the recorded target
+(matches.csv target_runs, else the first innings total plus one) is
+reached, and reduced-overs chases after target_overs, matching
+features.chase_terms. Every match draws from its own random stream (the
+child of SeedSequence(seed) at its schedule position), so the output
+does not depend on the chunk size. Generation is vectorized over
+(matches, innings, deliveries) arrays and written chunk by chunk.
+
+Columns: match_id, inning, batting_team, bowling_team, over, ball, batter,
+batsman_runs, extra_runs, total_runs, is_wicket, player_dismissed
+
+Usage:
+    python synth_deliveries.py deliveries.csv --seed 42 --repeat 100
+    python synth_deliveries.py deliveries.parquet --calibrate real_deliveries.csv
+"""
+import argparse
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from features import (EXTRA, OUTCOME_EXTRAS, OUTCOME_RUNS, OUTCOME_WICKET, PHASE_OF_BALL, PHASE_PROBS,
+                      TOTAL_BALLS, classify_deliveries, match_schedule)
+
+# Delivery slots per innings: the legal balls plus room for extras (an innings averages about four)
+MAX_DELIVERIES = TOTAL_BALLS + 30
+
+# How a stronger innings (positive strength) shifts each outcome's log-odds
+STRENGTH_SENSITIVITY = np.array([-1.0, -0.5, 0.0, 0.3, 0.0, 1.0, 1.0, 0.0])
+STRENGTH_SD = 0.15
+WINNER_EDGE = 0.1
+
+COLUMNS = ['match_id', 'inning', 'batting_team', 'bowling_team', 'over', 'ball', 'batter',
+           'batsman_runs', 'extra_runs', 'total_runs', 'is_wicket', 'player_dismissed']
+
+
+def calibrate(deliveries):
+    """Estimate PHASE_PROBS from a real deliveries frame"""
+    phase, outcome = classify_deliveries(deliveries)
+    counts = np.zeros((3, len(OUTCOME_RUNS)))
+    np.add.at(counts, (phase, outcome), 1)
+    return counts / counts.sum(axis=1, keepdims=True)
+
+
+class DeliveriesGenerator:
+    """Seeded generator of synthetic deliveries for a match schedule"""
+
+    def __init__(self, schedule, seed=42, phase_probs=PHASE_PROBS, top_batsmen=()):
+        self.schedule = schedule
+        self.seed = seed
+        self.log_probs = np.log(phase_probs)
+        self.top_batsmen = np.asarray(list(top_batsmen), dtype=object)
+
+        teams = pd.unique(schedule[['bat_first', 'chasing']].to_numpy().ravel())
+        self.team_code = {team: i for i, team in enumerate(teams)}
+        # Eleven generic batters per team, indexed by batting position
+        self.lineups = np.array([[f'{team} Batter {slot + 1}' for slot in range(11)] for team in teams],
+                                dtype=object)
+
+    def _draws(self, positions):
+        """Random numbers of the matches at these schedule positions, one stream per match
+
+        Returns (normal, uniform) of shapes (n, 2) and (n, 2, 2 * TOTAL_BALLS + 3).
+        """
+        normal = np.empty((len(positions), 2))
+        uniform = np.empty((len(positions), 2, 2 * TOTAL_BALLS + 3))
+        for i, position in enumerate(positions):
+            # The child SeedSequence(seed).spawn would hand out at this position
+            rng = np.random.default_rng(np.random.SeedSequence(self.seed, spawn_key=(int(position),)))
+            normal[i] = rng.standard_normal(2)
+            uniform[i] = rng.random(uniform.shape[1:])
+        return normal, uniform
+
+    def _outcomes(self, batting, winner, normal, uniform):
+        """Legal-ball outcome and number of extras before it for every (match, innings, legal ball)"""
+        edge = np.where(winner[:, None] == batting, WINNER_EDGE,
+                        np.where(pd.isnull(winner)[:, None], 0.0, -WINNER_EDGE))
+        strength = normal * STRENGTH_SD + edge
+
+        # Per-innings, per-phase outcome distribution, split into extras and the legal outcomes
+        logits = self.log_probs[None, None] + strength[..., None, None] * STRENGTH_SENSITIVITY
+        probs = np.exp(logits)
+        probs = (probs / probs.sum(axis=-1, keepdims=True))[:, :, PHASE_OF_BALL]
+        p_extra = probs[..., EXTRA]
+        cdf = np.cumsum(probs[..., :EXTRA], axis=-1) / (1 - p_extra[..., None])
+
+        legal = (uniform[..., :TOTAL_BALLS, None] > cdf[..., :-1]).sum(axis=-1)
+        # Extras before a legal ball are geometric: P(at least k) = p_extra^k
+        u = 1 - uniform[..., TOTAL_BALLS:2 * TOTAL_BALLS]
+        n_extras = np.minimum(np.floor(np.log(u) / np.log(p_extra)), MAX_DELIVERIES).astype(int)
+        return legal, n_extras
+
+    def generate(self, schedule, positions=None):
+        """DataFrame of deliveries for a block of scheduled matches at these schedule positions"""
+        if positions is None:
+            positions = np.arange(len(schedule))
+        n_matches = len(schedule)
+        batting = np.stack([schedule['bat_first'].to_numpy(), schedule['chasing'].to_numpy()], axis=1)
+        normal, uniform = self._draws(positions)
+        legal, n_extras = self._outcomes(batting, schedule['winner'].to_numpy(), normal, uniform)
+
+        # Lay the legal balls out in delivery order, extras filling the slots before each one;
+        # the rare legal balls past MAX_DELIVERIES are dropped
+        slot_of_ball = np.arange(TOTAL_BALLS) + np.cumsum(n_extras, axis=-1)
+        outcome = np.full((n_matches, 2, MAX_DELIVERIES), EXTRA)
+        match, innings, ball = np.nonzero(slot_of_ball < MAX_DELIVERIES)
+        outcome[match, innings, slot_of_ball[match, innings, ball]] = legal[match, innings, ball]
+
+        runs = OUTCOME_RUNS[outcome]
+        extras = OUTCOME_EXTRAS[outcome]
+        total = runs + extras
+        wicket = OUTCOME_WICKET[outcome]
+
+        # Extras count towards the over of the legal ball they precede
+        is_legal = (outcome != EXTRA).astype(int)
+        legal_before = np.cumsum(is_legal, axis=-1) - is_legal
+        over = np.minimum(legal_before // 6, TOTAL_BALLS // 6 - 1)
+        over_start = (slot_of_ball - n_extras)[..., ::6]
+        ball_in_over = np.arange(MAX_DELIVERIES) - np.take_along_axis(over_start, over, axis=-1) + 1
+
+        # Innings end at the tenth wicket or after their allotted legal balls
+        wickets_before = np.cumsum(wicket, axis=-1) - wicket
+        allotted = np.stack([np.full(n_matches, TOTAL_BALLS), schedule['chase_balls'].to_numpy()], axis=1)
+        alive = (wickets_before < 10) & (legal_before < allotted[..., None])
+        score_before = np.cumsum(total * alive, axis=-1) - total * alive
+
+        # Chase ends once the target is reached
+        first_total = (total[:, 0] * alive[:, 0]).sum(axis=-1)
+        target = schedule['target_runs'].to_numpy(dtype=float)
+        target = np.where(np.isnan(target), first_total + 1, target)
+        alive[:, 1] &= score_before[:, 1] < target[:, None]
+
+        # Batter at the striker's end is the next one in after each wicket
+        team_code = np.vectorize(self.team_code.get, otypes=[int])(batting)
+        slot = np.minimum(wickets_before, 10)
+        batter = self.lineups[team_code[..., None], slot]
+        if len(self.top_batsmen):
+            # About half the innings have a listed top batsman in the top three
+            u = uniform[..., 2 * TOTAL_BALLS:]
+            top_slot = np.where(u[..., 0] < 0.5, (u[..., 1] * 3).astype(int), -1)
+            top_name = self.top_batsmen[(u[..., 2] * len(self.top_batsmen)).astype(int)]
+            batter = np.where(slot == top_slot[..., None], top_name[..., None], batter)
+
+        keep = alive.ravel()
+        shape = outcome.shape
+        return pd.DataFrame({
+            'match_id': np.broadcast_to(schedule['match_id'].to_numpy()[:, None, None], shape).ravel()[keep],
+            'inning': np.broadcast_to(np.array([1, 2])[None, :, None], shape).ravel()[keep],
+            'batting_team': np.broadcast_to(batting[..., None], shape).ravel()[keep],
+            'bowling_team': np.broadcast_to(batting[:, ::-1, None], shape).ravel()[keep],
+            'over': over.ravel()[keep],
+            'ball': ball_in_over.ravel()[keep],
+            'batter': batter.ravel()[keep],
+            'batsman_runs': runs.ravel()[keep],
+            'extra_runs': extras.ravel()[keep],
+            'total_runs': total.ravel()[keep],
+            'is_wicket': wicket.ravel()[keep],
+            'player_dismissed': np.where(wicket == 1, batter, None).ravel()[keep],
+        }, columns=COLUMNS)
+
+    def chunks(self, matches_per_chunk=5000):
+        """Yield deliveries DataFrames covering the whole schedule in order"""
+        for start in range(0, len(self.schedule), matches_per_chunk):
+            stop = min(start + matches_per_chunk, len(self.schedule))
+            yield self.generate(self.schedule.iloc[start:stop], np.arange(start, stop))
+
+
+def write_deliveries(generator, path, matches_per_chunk=5000):
+    """Stream generated chunks to CSV or Parquet; returns (rows, generate_s, write_s)"""
+    rows, generate_s, write_s = 0, 0.0, 0.0
+    parquet_writer = None
+    chunks = generator.chunks(matches_per_chunk)
+    try:
+        while True:
+            start = time.perf_counter()
+            chunk = next(chunks, None)
+            generate_s += time.perf_counter() - start
+            if chunk is None:
+                break
+
+            start = time.perf_counter()
+            if path.endswith('.parquet'):
+                import pyarrow as pa
+                import pyarrow.parquet as pq
+                table = pa.Table.from_pandas(chunk, preserve_index=False)
+                if parquet_writer is None:
+                    parquet_writer = pq.ParquetWriter(path, table.schema)
+                parquet_writer.write_table(table)
+            else:
+                chunk.to_csv(path, mode='w' if rows == 0 else 'a', header=rows == 0, index=False)
+            write_s += time.perf_counter() - start
+            rows += len(chunk)
+    finally:
+        if parquet_writer is not None:
+            parquet_writer.close()
+    return rows, generate_s, write_s
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic IPL deliveries")
+    parser.add_argument('output', nargs='?', default='deliveries.csv', help="CSV or .parquet file")
+    parser.add_argument('--matches', default='matches.csv')
+    parser.add_argument('--batting', default='final_batting_2023.csv',
+                        help="Top batsmen list used for the top_batsman_playing feature")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--repeat', type=int, default=1, help="Repeat the schedule with new match ids")
+    parser.add_argument('--calibrate', default=None, help="Real deliveries file to estimate outcome rates from")
+    parser.add_argument('--chunk-matches', type=int, default=5000)
+    args = parser.parse_args()
+
+    matches = pd.read_csv(args.matches)
+    phase_probs = PHASE_PROBS if args.calibrate is None else calibrate(pd.read_csv(args.calibrate))
+    top_batsmen = pd.read_csv(args.batting)['Player'].unique()[:50]
+
+    generator = DeliveriesGenerator(match_schedule(matches, args.repeat), args.seed, phase_probs, top_batsmen)
+    rows, generate_s, write_s = write_deliveries(generator, args.output, args.chunk_matches)
+    print(f"✅ Wrote {rows:,} deliveries to '{args.output}'\n"
+          f"Generate: {rows / max(generate_s, 1e-9):,.0f} rows/sec, "
+          f"write: {rows / max(write_s, 1e-9):,.0f} rows/sec", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
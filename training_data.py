@@ -0,0 +1,98 @@
+"""Match-grouped datasets for the chase model
+
+Every ball of a chase becomes a training row, so one match contributes
+100+ highly correlated rows. Splitting rows at random puts the same
+match in train and test and inflates holdout scores; here the split is
+by match_id. Within the training matches the rows can be thinned (a
+random subset of balls per match), weighted so every match counts the
+same, or deduplicated into one weighted row per binned match state.
+compare_datasets fits the same pipeline on each variant and reports fit
+time, peak resident memory and holdout log-loss.
+"""
+import time
+
+import numpy as np
+from sklearn.metrics import log_loss
+from sklearn.model_selection import GroupShuffleSplit
+
+from instrumentation import RssSampler
+
+# No two balls share every continuous feature, so deduplication merges balls with the
+# same categorical features, wickets and outcome whose chase position falls in the same
+# bin: balls_left by the over, runs_left by 5 runs
+DEDUP_KEY = ['batting_team', 'bowling_team', 'venue', 'wickets', 'top_batsman_playing']
+DEDUP_BINS = {'balls_left': 6, 'runs_left': 5}
+
+
+def split_by_match(data, test_size=0.2, seed=42):
+    """Train and test frames with every match entirely on one side"""
+    splitter = GroupShuffleSplit(n_splits=1, test_size=test_size, random_state=seed)
+    train_idx, test_idx = next(splitter.split(data, groups=data['match_id']))
+    return data.iloc[train_idx], data.iloc[test_idx]
+
+
+def subsample_balls(data, balls_per_match, seed=42):
+    """Keep at most balls_per_match random balls of every match"""
+    order = np.random.default_rng(seed).permutation(len(data))
+    shuffled = data.iloc[order]
+    keep = shuffled.groupby('match_id').cumcount() < balls_per_match
+    return shuffled[keep.to_numpy()].sort_index()
+
+
+def match_weights(data):
+    """Sample weights giving every match the same total weight, mean 1"""
+    per_match = data.groupby('match_id')['match_id'].transform('size').to_numpy()
+    weights = 1 / per_match
+    return weights * len(weights) / weights.sum()
+
+
+def deduplicate(data, features, target, key=DEDUP_KEY, bins=DEDUP_BINS):
+    """One row per binned state and outcome: other features averaged, copies as 'weight'"""
+    binned = {f'{col}_bin': data[col] // step for col, step in bins.items()}
+    groups = data.assign(**binned).groupby(key + list(binned) + [target], dropna=False,
+                                           observed=True, sort=False)
+    unique = groups[[col for col in features if col not in key]].mean()
+    unique['weight'] = groups.size()
+    return unique.reset_index()[features + [target, 'weight']]
+
+
+def fit_and_measure(pipe, X, y, sample_weight=None):
+    """Fit pipe and return (fit seconds, peak resident memory growth in MB)"""
+    fit_params = {} if sample_weight is None else {'model__sample_weight': sample_weight}
+    with RssSampler() as rss:
+        start = time.perf_counter()
+        pipe.fit(X, y, **fit_params)
+        elapsed = time.perf_counter() - start
+    return elapsed, rss.peak_mb
+
+
+def compare_datasets(build_pipeline, train, test, features, target='result', balls_per_match=(30, 10)):
+    """Fit build_pipeline() on each training variant and score the same match holdout"""
+    variants = {
+        'all balls': (train, None),
+        'match-weighted': (train, match_weights(train)),
+    }
+    for k in balls_per_match:
+        variants[f'{k} balls/match'] = (subsample_balls(train, k), None)
+    unique = deduplicate(train, features, target)
+    variants['deduplicated'] = (unique, unique['weight'].to_numpy())
+
+    report = {}
+    for name, (data, weights) in variants.items():
+        pipe = build_pipeline()
+        fit_s, peak_rss_mb = fit_and_measure(pipe, data[features], data[target], weights)
+        report[name] = {
+            'rows': len(data),
+            'fit_s': fit_s,
+            'peak_rss_mb': peak_rss_mb,
+            'log_loss': log_loss(test[target], pipe.predict_proba(test[features])[:, 1])
+        }
+    return report
+
+
+def print_dataset_report(report):
+    """Print a dataset comparison report as a small table"""
+    print(f"{'Dataset':<16}{'Rows':>10}{'Fit (s)':>10}{'Peak RSS (MB)':>15}{'Log-loss':>10}")
+    for name, row in report.items():
+        peak = f"{row['peak_rss_mb']:.1f}" if row['peak_rss_mb'] is not None else 'n/a'
+        print(f"{name:<16}{row['rows']:>10,}{row['fit_s']:>10.1f}{peak:>15}{row['log_loss']:>10.4f}")
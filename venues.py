@@ -0,0 +1,142 @@
+"""Canonical venue names for training and serving
+
+Raw venue strings in matches.csv ("M Chinnaswamy Stadium, Bengaluru",
+"Feroz Shah Kotla", ...) are fuzzy-matched once to the VENUES list the
+app offers and stored in venue_index.json. At run time every column is
+mapped through that index as a categorical: one dictionary lookup per
+distinct venue, then a vectorized remap of the integer codes.
+
+Usage:
+    python venues.py    # rebuild venue_index.json and print a report
+"""
+import difflib
+import json
+import os
+import re
+import time
+
+import numpy as np
+import pandas as pd
+
+# Venues the model is trained and served on (must match app.py's selector)
+VENUES = [
+    'Eden Gardens', 'Wankhede Stadium', 'MA Chidambaram Stadium',
+    'Arun Jaitley Stadium', 'Narendra Modi Stadium',
+    'M. Chinnaswamy Stadium', 'Punjab Cricket Association Stadium',
+    'Rajiv Gandhi International Stadium', 'Sawai Mansingh Stadium',
+    'Bharat Ratna Shri Atal Bihari Vajpayee Ekana Cricket Stadium',
+    'Brabourne Stadium', 'DY Patil Stadium', 'Holkar Cricket Stadium',
+    'Others'
+]
+OTHER_VENUE = 'Others'
+
+# Grounds that were renamed or are listed under a different name
+VENUE_ALIASES = {
+    'feroz shah kotla': 'Arun Jaitley Stadium',
+    'sardar patel stadium': 'Narendra Modi Stadium',
+    'dr dy patil sports academy': 'DY Patil Stadium',
+}
+
+VENUE_INDEX_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'venue_index.json')
+
+_index = None
+
+
+def normalize_venue(name):
+    """Lowercase, drop the city suffix and punctuation"""
+    name = str(name).split(',')[0].lower()
+    name = re.sub(r"[.'\-]", ' ', name)
+    return ' '.join(name.split())
+
+
+_CANONICAL = {normalize_venue(venue): venue for venue in VENUES if venue != OTHER_VENUE}
+
+
+def match_venue(name):
+    """Map one raw venue string to a canonical venue (slow path, used to build the index)"""
+    key = normalize_venue(name)
+    if key in VENUE_ALIASES:
+        return VENUE_ALIASES[key]
+
+    # Every word of a canonical name present, most specific name wins
+    tokens = set(key.split())
+    candidates = [c for c in _CANONICAL if set(c.split()) <= tokens]
+    if candidates:
+        return _CANONICAL[max(candidates, key=lambda c: len(c.split()))]
+
+    # Spelling variants
+    close = difflib.get_close_matches(key, list(_CANONICAL), n=1, cutoff=0.9)
+    return _CANONICAL[close[0]] if close else OTHER_VENUE
+
+
+def build_venue_index(raw_names):
+    """Precompute raw name -> canonical venue for every distinct name"""
+    index = {venue: venue for venue in VENUES}
+    for name in sorted(set(raw_names)):
+        index.setdefault(name, match_venue(name))
+    return index
+
+
+def get_venue_index():
+    """The precomputed index, loaded once per process"""
+    global _index
+    if _index is None:
+        _index = {venue: venue for venue in VENUES}
+        if os.path.exists(VENUE_INDEX_PATH):
+            with open(VENUE_INDEX_PATH) as f:
+                _index.update(json.load(f))
+    return _index
+
+
+def canonicalize_venues(venues, index=None):
+    """Map a Series of raw venue strings to a categorical of canonical venues"""
+    index = get_venue_index() if index is None else index
+    raw = venues.astype('category')
+
+    # Names missing from the index are matched once and remembered
+    categories = raw.cat.categories
+    for name in categories:
+        if name not in index:
+            index[name] = match_venue(name)
+
+    code_of = {venue: code for code, venue in enumerate(VENUES)}
+    # Trailing -1 keeps missing values (code -1) missing
+    remap = np.array([code_of[index[name]] for name in categories] + [-1], dtype=np.int16)
+    codes = remap[raw.cat.codes.to_numpy()]
+    return pd.Series(pd.Categorical.from_codes(codes, categories=VENUES), index=venues.index,
+                     name=venues.name)
+
+
+def venue_report(venues, index=None):
+    """Rows whose venue category changes, per mapping, and the per-row mapping cost"""
+    start = time.perf_counter()
+    canonical = canonicalize_venues(venues, index)
+    elapsed = time.perf_counter() - start
+
+    changed = venues.astype(str) != canonical.astype(str)
+    mappings = (pd.DataFrame({'raw': venues[changed], 'canonical': canonical[changed]})
+                .value_counts().rename('rows').reset_index())
+    return {
+        'rows': len(venues),
+        'changed': int(changed.sum()),
+        'per_row_us': elapsed / max(len(venues), 1) * 1e6,
+        'mappings': mappings,
+    }
+
+
+def main():
+    matches = pd.read_csv('matches.csv')
+    history = pd.read_csv('IPL_Matches_2008_2022.csv')
+    index = build_venue_index(pd.concat([matches['venue'], history['Venue']]).dropna())
+    with open(VENUE_INDEX_PATH, 'w') as f:
+        json.dump(index, f, indent=2, sort_keys=True)
+    print(f"✅ Saved {len(index)} venue names to '{VENUE_INDEX_PATH}'")
+
+    report = venue_report(matches['venue'], index)
+    print(f"\nmatches.csv: {report['changed']:,} of {report['rows']:,} rows change category "
+          f"({report['per_row_us']:.2f} us/row)\n")
+    print(report['mappings'].to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()